@@ -0,0 +1,60 @@
+import numpy as np
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+from sentence_engine import SentenceScoringEngine
+
+
+def score_token_batch(engine: SentenceScoringEngine,
+                      items: Sequence[List[Tuple[Hashable, str]]],
+                      skipped_items: int = 0) -> Dict:
+    """
+    Score many items (words or sentences), each a list of (context, token) pairs
+    Tokens are grouped by context through a dict, and each distinct context
+    is scored with one vectorized distribution lookup. Returns per-token log2
+    probabilities (-inf where the model gives zero probability), item offsets
+    into that array, and aggregate perplexity / OOV counts
+    """
+    lengths = np.fromiter((len(pairs) for pairs in items), dtype=np.int64, count=len(items))
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    total = int(offsets[-1])
+
+    token_ids = np.empty(total, dtype=np.int64)
+    groups: Dict[Hashable, List[int]] = {}
+    oov_positions = []
+    position = 0
+    for pairs in items:
+        for context, token in pairs:
+            token_id = engine.word_to_id.get(token, -1)
+            token_ids[position] = token_id
+            if token_id < 0:
+                oov_positions.append((position, context, token))
+            else:
+                groups.setdefault(context, []).append(position)
+            position += 1
+
+    probs = np.zeros(total)
+    for context, positions in groups.items():
+        positions = np.asarray(positions, dtype=np.int64)
+        probs[positions] = engine.distribution(context)[token_ids[positions]]
+    for position, context, token in oov_positions:
+        # Only Laplace gives unseen tokens mass; the scalar path handles that
+        probs[position] = engine.probability(context, token)
+
+    with np.errstate(divide='ignore'):
+        log2_probs = np.log2(probs)
+
+    finite = np.isfinite(log2_probs)
+    scored = int(finite.sum())
+    perplexity = float(2 ** (-log2_probs[finite].mean())) if scored else float('inf')
+
+    return {
+        'log2_probs': log2_probs,
+        'offsets': offsets,
+        'perplexity': perplexity,
+        'token_count': total,
+        'scored_count': scored,
+        'zero_prob_count': total - scored,
+        'oov_count': len(oov_positions),
+        'skipped_items': skipped_items
+    }
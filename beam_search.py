@@ -0,0 +1,104 @@
+import numpy as np
+from typing import List, NamedTuple, Optional, Tuple
+
+from sentence_engine import SentenceScoringEngine
+
+
+class BeamNode(NamedTuple):
+    """
+    One hypothesis: its last word plus a parent pointer, so beams that
+    share a prefix share its nodes instead of copying word lists
+    """
+    parent: Optional['BeamNode']
+    word_id: int
+    context: Tuple[str, ...]
+    log2_prob: float
+    length: int
+
+
+def _words(node: BeamNode, id_to_word: List[str]) -> List[str]:
+    """Words of a hypothesis, recovered by walking the parent pointers"""
+    words = []
+    while node is not None and node.word_id >= 0:
+        words.append(id_to_word[node.word_id])
+        node = node.parent
+    return words[::-1]
+
+
+def beam_search(engine: SentenceScoringEngine, context: Tuple[str, ...], beam_width: int = 5,
+                n_best: int = 5, max_length: int = 20, min_prob: float = 0.0,
+                beam_threshold: Optional[float] = None,
+                end_token: str = '</s>', start_token: str = '<s>') -> List[Tuple[List[str], float, bool]]:
+    """
+    n-best word sequences after a context, as (words, log2 probability, finished)
+    Each step expands every live hypothesis with the beam_width most probable
+    next words of its context (one memoized distribution per distinct context,
+    shared by all beams) and keeps the beam_width best extensions overall.
+    Pruning: words with probability below min_prob are never expanded, and
+    extensions scoring more than beam_threshold (log2 units) below the step's
+    best are dropped. A hypothesis finishes by emitting end_token, whose
+    probability is included; the search stops early once no live hypothesis
+    can beat the n_best-th finished one, since scores only fall. Hypotheses
+    still live at max_length fill any remaining n-best slots, marked unfinished
+    """
+    end_id = engine.word_to_id.get(end_token, -1)
+    start_id = engine.word_to_id.get(start_token, -1)
+    log_min_prob = np.log2(min_prob) if min_prob > 0 else -np.inf
+
+    beams = [BeamNode(None, -1, tuple(context), 0.0, 0)]
+    finished: List[BeamNode] = []
+    # context -> log2 distribution, shared by every beam and step of this search
+    log_distributions = {}
+
+    for _ in range(max_length):
+        parents = []
+        word_ids = []
+        scores = []
+        for node in beams:
+            log_probs = log_distributions.get(node.context)
+            if log_probs is None:
+                with np.errstate(divide='ignore'):
+                    log_probs = np.log2(engine.distribution(node.context))
+                if start_id >= 0:
+                    log_probs[start_id] = -np.inf
+                log_distributions[node.context] = log_probs
+            top = min(beam_width, len(log_probs))
+            candidates = np.argpartition(-log_probs, top - 1)[:top] if top else np.zeros(0, dtype=np.int64)
+            candidates = candidates[log_probs[candidates] > log_min_prob]
+            parents.extend([node] * len(candidates))
+            word_ids.append(candidates)
+            scores.append(node.log2_prob + log_probs[candidates])
+
+        if not parents:
+            beams = []
+            break
+        word_ids = np.concatenate(word_ids)
+        scores = np.concatenate(scores)
+        if beam_threshold is not None:
+            keep = scores >= scores.max() - beam_threshold
+            parents = [node for node, kept in zip(parents, keep) if kept]
+            word_ids, scores = word_ids[keep], scores[keep]
+
+        # Best extensions first; ties keep expansion order so results are deterministic
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        beams = []
+        for i in order:
+            parent, word_id, score = parents[i], int(word_ids[i]), float(scores[i])
+            if word_id == end_id:
+                # An immediate end_token is an empty sentence, never a useful candidate
+                if parent.length > 0:
+                    finished.append(BeamNode(parent, -1, parent.context, score, parent.length))
+                continue
+            if len(beams) < beam_width:
+                word = engine.id_to_word[word_id]
+                beams.append(BeamNode(parent, word_id, parent.context[1:] + (word,), score, parent.length + 1))
+
+        finished.sort(key=lambda node: -node.log2_prob)
+        del finished[n_best:]
+        if not beams or (len(finished) == n_best and beams[0].log2_prob <= finished[-1].log2_prob):
+            break
+
+    results = [(_words(node.parent, engine.id_to_word), node.log2_prob, True) for node in finished]
+    for node in beams[:n_best - len(results)]:
+        results.append((_words(node, engine.id_to_word), node.log2_prob, False))
+    return results
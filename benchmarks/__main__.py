@@ -0,0 +1,49 @@
+import argparse
+import json
+import sys
+
+from benchmarks.suite import BENCHMARKS, compare, default_config, run_suite
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Benchmark training, generation, scoring and model loading on synthetic isiXhosa-like corpora"
+    )
+    parser.add_argument('benchmarks', nargs='*', metavar='NAME', help=f"subset to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--tokens', type=int, default=100000, help="training corpus size (10K to 100M)")
+    parser.add_argument('--model-tokens', type=int, help="corpus size of the models used by the other benchmarks")
+    parser.add_argument('--eval-tokens', type=int, default=10000, help="held-out size for perplexity")
+    parser.add_argument('--samples', type=int, default=1000, help="calls per latency benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-isolate', action='store_true', help="run every benchmark in this process")
+    parser.add_argument('--output', help="write the JSON report here (default: stdout)")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed relative slowdown (default 10%%)")
+    args = parser.parse_args(argv)
+
+    config = default_config(tokens=args.tokens, samples=args.samples, seed=args.seed,
+                            model_tokens=args.model_tokens, eval_tokens=args.eval_tokens)
+    report = run_suite(args.benchmarks or None, config, isolate=not args.no_isolate)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.threshold)
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else 'ok'
+        print(f"{row['benchmark']:<20} {row['metric']:<12} {row['baseline']:>14.3f} -> {row['current']:>14.3f} "
+              f"({row['change']:+.1%}) {flag}", file=sys.stderr)
+    return 1 if any(row['regression'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import random
+from itertools import accumulate
+from typing import Iterator, List, Tuple
+
+from char_corpus import CHARACTER_PATTERNS, COMMON_XHOSA_WORDS
+from word_corpus import iter_word_corpus
+
+# Noun-class / infinitive prefixes that start synthetic words
+_PREFIXES = ['umu', 'aba', 'imi', 'ama', 'isi', 'izi', 'ubu', 'uku', 'ili', 'ndi', 'u', 'a', 'e', 'i']
+_BATCH = 10000
+
+
+def build_lexicon(size: int = 20000, seed: int = 0) -> List[str]:
+    """
+    Distinct isiXhosa-like words, most frequent first
+    Real words from the corpora come first; the rest are built from a
+    prefix plus 1-3 of the character-corpus syllable patterns
+    """
+    rng = random.Random(seed)
+    lexicon = list(dict.fromkeys(w.lower() for w in list(iter_word_corpus()) + COMMON_XHOSA_WORDS))
+    seen = set(lexicon)
+    patterns = sorted(set(CHARACTER_PATTERNS))
+    while len(lexicon) < size:
+        word = rng.choice(_PREFIXES) + ''.join(rng.choice(patterns) for _ in range(rng.randint(1, 3)))
+        if word not in seen:
+            seen.add(word)
+            lexicon.append(word)
+    return lexicon[:size]
+
+
+def iter_synthetic_words(num_tokens: int, seed: int = 0, lexicon_size: int = 20000,
+                         zipf_exponent: float = 1.1) -> Iterator[str]:
+    """Stream num_tokens words drawn from the lexicon with Zipfian frequencies"""
+    rng = random.Random(seed)
+    lexicon = build_lexicon(lexicon_size, seed)
+    cum_weights = list(accumulate(1.0 / (rank + 1) ** zipf_exponent for rank in range(len(lexicon))))
+    remaining = num_tokens
+    while remaining > 0:
+        batch = min(remaining, _BATCH)
+        yield from rng.choices(lexicon, cum_weights=cum_weights, k=batch)
+        remaining -= batch
+
+
+def iter_synthetic_sentences(num_tokens: int, seed: int = 0, min_words: int = 3, max_words: int = 12,
+                             lexicon_size: int = 20000) -> Iterator[str]:
+    """Stream capitalized sentences totalling about num_tokens words"""
+    rng = random.Random(seed + 1)
+    words = iter_synthetic_words(num_tokens, seed, lexicon_size)
+    while True:
+        sentence = [word for _, word in zip(range(rng.randint(min_words, max_words)), words)]
+        if not sentence:
+            return
+        text = ' '.join(sentence)
+        yield text[0].upper() + text[1:]
+
+
+def iter_synthetic_conversations(num_tokens: int, seed: int = 0,
+                                 lexicon_size: int = 20000) -> Iterator[Tuple[str, str]]:
+    """Stream (input, response) pairs in the shape of WORD_CONVERSATIONS, about num_tokens words in total"""
+    sentences = iter_synthetic_sentences(num_tokens, seed, min_words=1, max_words=8, lexicon_size=lexicon_size)
+    for prompt, response in zip(sentences, sentences):
+        yield prompt, response
+
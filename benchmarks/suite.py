@@ -0,0 +1,303 @@
+import multiprocessing
+import os
+import pickle
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from character_ngram import CharacterNGram
+from sentence_ngram import SentenceNGram
+from src.model.binary_format import load_binary_model, save_binary_model
+from src.model.ngram import build_ngram_model, generate_text
+from src.model.response_index import ResponseIndex
+from benchmarks.corpus import iter_synthetic_conversations, iter_synthetic_sentences, iter_synthetic_words
+
+# Held-out text for perplexity is drawn with a different seed than the training text
+HELD_OUT_SEED_OFFSET = 1000
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _latency_summary(latencies: List[float]) -> Dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        'mean': float(ms.mean()),
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99))
+    }
+
+
+def _timed_calls(fn: Callable[[], object], samples: int) -> Dict:
+    """Call fn samples times; throughput in calls per second plus latency percentiles"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(samples):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'items': samples,
+        'unit': 'calls',
+        'throughput': samples / seconds,
+        'latency_ms': _latency_summary(latencies)
+    }
+
+
+def _timed_bulk(fn: Callable[[], int], unit: str) -> Dict:
+    """Run fn once; it returns how many units it processed"""
+    start = time.perf_counter()
+    items = fn()
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'items': items, 'unit': unit, 'throughput': items / seconds if seconds else 0.0}
+
+
+def _char_model(config: Dict) -> CharacterNGram:
+    model = CharacterNGram(n=config['char_n'])
+    model.train_stream(iter_synthetic_words(config['model_tokens'], config['seed']))
+    return model
+
+
+def _sentence_model(config: Dict) -> SentenceNGram:
+    model = SentenceNGram(n=config['sentence_n'], vectorized=True)
+    model.train_stream(iter_synthetic_sentences(config['model_tokens'], config['seed']))
+    return model
+
+
+def _ngram_model(config: Dict, tokens: int) -> Dict:
+    return build_ngram_model(iter_synthetic_conversations(tokens, config['seed']), n=2)
+
+
+def bench_train_char(config: Dict) -> Dict:
+    def train() -> int:
+        CharacterNGram(n=config['char_n']).train_stream(iter_synthetic_words(config['tokens'], config['seed']))
+        return config['tokens']
+    return _timed_bulk(train, 'tokens')
+
+
+def bench_train_sentence(config: Dict) -> Dict:
+    def train() -> int:
+        SentenceNGram(n=config['sentence_n']).train_stream(iter_synthetic_sentences(config['tokens'], config['seed']))
+        return config['tokens']
+    return _timed_bulk(train, 'tokens')
+
+
+def bench_train_ngram(config: Dict) -> Dict:
+    def train() -> int:
+        _ngram_model(config, config['tokens'])
+        return config['tokens']
+    return _timed_bulk(train, 'tokens')
+
+
+def bench_generate_word(config: Dict) -> Dict:
+    model = _char_model(config)
+    random.seed(config['seed'])
+    return _timed_calls(model.generate_word, config['samples'])
+
+
+def bench_generate_sentence(config: Dict) -> Dict:
+    model = _sentence_model(config)
+    random.seed(config['seed'])
+    return _timed_calls(model.generate_sentence, config['samples'])
+
+
+def bench_generate_text(config: Dict) -> Dict:
+    model = _ngram_model(config, config['model_tokens'])
+    rng = random.Random(config['seed'])
+    return _timed_calls(lambda: generate_text(model, n=2, rng=rng), config['samples'])
+
+
+def bench_perplexity_char(config: Dict) -> Dict:
+    model = _char_model(config)
+    words = list(iter_synthetic_words(config['eval_tokens'], config['seed'] + HELD_OUT_SEED_OFFSET))
+
+    def score() -> int:
+        model.perplexity(words)
+        return len(words)
+    return _timed_bulk(score, 'words')
+
+
+def bench_perplexity_sentence(config: Dict) -> Dict:
+    model = _sentence_model(config)
+    sentences = list(iter_synthetic_sentences(config['eval_tokens'], config['seed'] + HELD_OUT_SEED_OFFSET))
+
+    def score() -> int:
+        model.perplexity(sentences)
+        return len(sentences)
+    return _timed_bulk(score, 'sentences')
+
+
+def bench_model_load(config: Dict) -> Dict:
+    """Load time of the pickled models and of the memory-mapped binary n-gram model"""
+    char_model = _char_model(config)
+    # A served model has generated before it is saved, so its lazily built structures must pickle too
+    random.seed(config['seed'])
+    for _ in range(config['samples']):
+        char_model.generate_word()
+    sentence_model = _sentence_model(config)
+    ngram_model = _ngram_model(config, config['model_tokens'])
+    repeats = max(1, config['samples'] // 100)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model in (('char_pickle', char_model), ('sentence_pickle', sentence_model),
+                            ('ngram_pickle', ngram_model)):
+            path = os.path.join(tmp, f'{name}.pkl')
+            with open(path, 'wb') as f:
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            def load(path=path):
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+            results[name] = dict(_timed_calls(load, repeats), bytes=os.path.getsize(path))
+
+        path = os.path.join(tmp, 'ngram.bin')
+        save_binary_model(path, ngram_model)
+        results['ngram_binary'] = dict(_timed_calls(lambda: load_binary_model(path), repeats),
+                                       bytes=os.path.getsize(path))
+
+    seconds = sum(r['seconds'] for r in results.values())
+    items = sum(r['items'] for r in results.values())
+    return {'seconds': seconds, 'items': items, 'unit': 'loads', 'throughput': items / seconds,
+            'latency_ms': _latency_summary([r['latency_ms']['mean'] / 1000 for r in results.values()]),
+            'formats': results}
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    """text with one character substituted, deleted or inserted"""
+    i = rng.randrange(len(text))
+    char = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text[:i] + char + text[i + 1:]
+    if edit == 1:
+        return text[:i] + text[i + 1:]
+    return text[:i] + char + text[i:]
+
+
+def bench_response_lookup(config: Dict) -> Dict:
+    """Nearest-match ResponseIndex lookups of stored inputs with one typo each"""
+    pairs = dict(iter_synthetic_conversations(config['model_tokens'], config['seed']))
+    index = ResponseIndex(pairs)
+    rng = random.Random(config['seed'])
+    prompts = list(pairs)
+    queries = iter([_typo(rng.choice(prompts), rng) for _ in range(config['samples'])])
+    matched = 0
+
+    def lookup():
+        nonlocal matched
+        matched += index.nearest(next(queries)) is not None
+    result = _timed_calls(lookup, config['samples'])
+    return dict(result, pairs=len(index), matched=matched)
+
+
+BENCHMARKS: Dict[str, Callable[[Dict], Dict]] = {
+    'train_char': bench_train_char,
+    'train_sentence': bench_train_sentence,
+    'train_ngram': bench_train_ngram,
+    'generate_word': bench_generate_word,
+    'generate_sentence': bench_generate_sentence,
+    'generate_text': bench_generate_text,
+    'perplexity_char': bench_perplexity_char,
+    'perplexity_sentence': bench_perplexity_sentence,
+    'model_load': bench_model_load,
+    'response_lookup': bench_response_lookup
+}
+
+
+def default_config(tokens: int = 100000, samples: int = 1000, seed: int = 0,
+                   model_tokens: Optional[int] = None, eval_tokens: int = 10000) -> Dict:
+    """
+    Benchmark settings
+    :param tokens: corpus size for the training benchmarks
+    :param model_tokens: corpus size of the models used by the generation, scoring and load
+        benchmarks (defaults to tokens, capped at 1M so large runs stay about training)
+    """
+    return {
+        'tokens': tokens,
+        'model_tokens': model_tokens or min(tokens, 1000000),
+        'eval_tokens': eval_tokens,
+        'samples': samples,
+        'seed': seed,
+        'char_n': 4,
+        'sentence_n': 3
+    }
+
+
+def run_benchmark(name: str, config: Dict) -> Dict:
+    """Run one benchmark in this process and add its peak RSS"""
+    result = BENCHMARKS[name](config)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_suite(names: Optional[List[str]] = None, config: Optional[Dict] = None, isolate: bool = True) -> Dict:
+    """
+    Run benchmarks and collect a JSON-serializable report
+    With isolate, each benchmark runs in a fresh (spawned) process, so its
+    peak RSS is its own and not the high-water mark of earlier benchmarks
+    """
+    config = config or default_config()
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results[name] = executor.submit(run_benchmark, name, config).result()
+        else:
+            results[name] = run_benchmark(name, config)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'isolated': isolate,
+            'config': config
+        },
+        'benchmarks': results
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """
+    Compare a report against a saved baseline
+    A benchmark regresses when its throughput drops, or its p95 latency or
+    peak RSS grows, by more than threshold (a fraction of the baseline)
+    """
+    rows = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous is None:
+            continue
+        checks = [('throughput', current['throughput'], previous['throughput'], True),
+                  ('peak_rss_mb', current['peak_rss_mb'], previous['peak_rss_mb'], False)]
+        if 'latency_ms' in current and 'latency_ms' in previous:
+            checks.append(('p95_ms', current['latency_ms']['p95'], previous['latency_ms']['p95'], False))
+        for metric, value, base, higher_is_better in checks:
+            change = (value - base) / base if base else 0.0
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append({'benchmark': name, 'metric': metric, 'baseline': base, 'current': value,
+                         'change': change, 'regression': regressed})
+    return rows
+
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from tokenized_corpus import TokenizedCorpus
+
 # Character-level training data 
 CHARACTER_PATTERNS = [
     # Common Xhosa prefixes 
@@ -103,12 +106,19 @@ COMMON_XHOSA_WORDS = [
     "ndinamanzi", "ndinamasi", "ndinamafutha", "ndinamalahle", "ndinesonka"
 ]
 
+@lru_cache(maxsize=None)
+def get_char_tokens():
+    """Character corpus tokenized once per process (interned IDs, vocabulary and frequencies)"""
+    return TokenizedCorpus.from_words(CHARACTER_PATTERNS + COMMON_XHOSA_WORDS)
+
 def get_char_corpus():
-    """Get corpus for character-level N-gram training"""
-    patterns_text = " ".join(CHARACTER_PATTERNS)
-    words_text = " ".join(COMMON_XHOSA_WORDS)
-    return patterns_text + " " + words_text
+    """Get corpus for character-level N-gram training (joined once and cached)"""
+    return get_char_tokens().text
 
 def get_char_list():
-    """Get characters as list for training"""
-    return list(get_char_corpus())
\ No newline at end of file
+    """
+    Get the corpus characters for training, as a read-only sequence
+    This is the cached corpus string itself rather than a new list of
+    one-character strings; use list() on it if a mutable copy is needed
+    """
+    return get_char_tokens().text
\ No newline at end of file
@@ -1,7 +1,26 @@
+import bisect
+import heapq
 import math
 import random
+import time
 from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Set
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Dict, Tuple, Set, Optional
+from lru_cache import LRUCache
+from compact_counts import CompactNGramCounts, NGramCountsView
+from sentence_engine import SentenceScoringEngine
+from batch_scoring import score_token_batch
+from context_trie import ContextNode, ContextTrie
+from ngram_stats import count_histograms, top_ngrams
+from corpus_stream import CorpusSource, DEFAULT_CHUNK_SIZE, iter_words
+from src.model.sampling import Decoding, candidate_table, draw, make_decoding
+from instrumentation import metrics, record_generation
+from phonotactics import PhonotacticAutomaton
+
+# Most tables kept per (context, state, decoding)-keyed cache; decoding parameters come from
+# clients, so these caches are bounded. The per-context sampling tables are bounded by the
+# trained contexts instead, since only contexts stored in the trie are cached
+MAX_TABLE_CACHE_SIZE = 16384
 
 class CharacterNGram:
     """
@@ -9,38 +28,308 @@ class CharacterNGram:
     Focuses on generating morphologically valid Xhosa words
     """
     
-    def __init__(self, n: int = 4, smoothing: str = 'kneser_ney'):
+    def __init__(self, n: int = 4, smoothing: str = 'kneser_ney', compiled: bool = True,
+                 cache_size: Optional[int] = 100000):
         self.n = n
         self.smoothing = smoothing
+        self.compiled = compiled
         self.ngram_counts = defaultdict(Counter)
         self.context_counts = defaultdict(int)
         self.vocab: Set[str] = set()
         self.continuation_counts = defaultdict(set)
         self.total_chars = 0
+        # Distinct (context, char) n-grams, kept current as counts change so stats never rescan
+        self.ngram_types = 0
+        # context -> (chars, cumulative weights), filled lazily or by compile_sampling_tables()
+        self._sampling_tables: Dict[str, Tuple[List[str], List[float]]] = {}
+        # (context, decoding) -> (top candidate chars, cumulative probabilities) for temperature/top-k/top-p
+        self._decoding_tables = LRUCache(None if cache_size is None else min(cache_size, MAX_TABLE_CACHE_SIZE))
+        # (context, phonotactic state id, decoding) -> sampling table without the characters the state forbids;
+        # state ids belong to this model's automaton, so they stay valid when the model is pickled
+        self._phonotactics = PhonotacticAutomaton()
+        self._masked_tables = LRUCache(None if cache_size is None else min(cache_size, MAX_TABLE_CACHE_SIZE))
+        # Memoized Kneser-Ney probabilities keyed on (context, char)
+        self._probability_cache = LRUCache(cache_size)
+        self.cache_size = cache_size
+        self._engine = None
+        self._context_trie = None
+        # Top-k lists and histograms computed since the counts last changed
+        self._stats_cache: Dict = {}
+        
+    @property
+    def engine(self) -> SentenceScoringEngine:
+        """Vectorized scoring engine over the character counts, rebuilt lazily after training"""
+        if self._engine is None:
+            self._engine = SentenceScoringEngine(self, cache_size=self.cache_size)
+        return self._engine
+    
+    @property
+    def context_trie(self) -> ContextTrie:
+        """Reversed-context trie over the counts (backoff, generation, prefix queries), rebuilt lazily after training"""
+        if self._context_trie is None:
+            self._context_trie = ContextTrie(self.ngram_counts, self.context_counts)
+        return self._context_trie
         
+    def __getstate__(self) -> Dict:
+        # The trie's memoized transitions link its nodes into one deep graph that pickle
+        # would walk recursively; it is rebuilt lazily from the counts instead
+        state = self.__dict__.copy()
+        state['_context_trie'] = None
+        return state
+        
+    @classmethod
+    def from_ngram_counts(cls, ngram_counts: Dict[str, int], n: int, smoothing: str = 'kneser_ney',
+                          **kwargs) -> 'CharacterNGram':
+        """Build a model from precounted n-gram strings of length n (e.g. shared sweep counts)"""
+        model = cls(n=n, smoothing=smoothing, **kwargs)
+        for ngram, count in ngram_counts.items():
+            context = ngram[:-1]
+            char = ngram[-1]
+            
+            if char not in model.ngram_counts[context]:
+                model.ngram_types += 1
+            model.ngram_counts[context][char] += count
+            model.context_counts[context] += count
+            model.vocab.add(char)
+            model.continuation_counts[context].add(char)
+            model.total_chars += count
+        return model
+    
     def train(self, text_corpus: str):
         """Train the character-level N-gram model"""
-        text = text_corpus.lower()
+        self._ensure_mutable()
+        for word in text_corpus.lower().split():
+            self._train_word(word)
         
-        text = ' '.join(text.split())
+        self._invalidate_caches()
+    
+    def train_stream(self, source: CorpusSource, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Train from a file path or any iterable of text without holding the corpus in memory
+        Files are read in chunks of chunk_size characters
+        """
+        self._ensure_mutable()
+        for word in iter_words(source, chunk_size):
+            self._train_word(word.lower())
         
-        words = text.split()
-        for word in words:
-            if len(word) < 2:  
-                continue
-                
-            padded_word = '^' + word + '$'
+        self._invalidate_caches()
+    
+    def _word_ngrams(self, word: str) -> Iterator[Tuple[str, str]]:
+        """(context, char) pairs of a single lowercase word; words shorter than 2 characters have none"""
+        if len(word) < 2:  
+            return
             
-            for i in range(len(padded_word) - self.n + 1):
-                ngram = padded_word[i:i + self.n]
-                context = ngram[:-1]
-                char = ngram[-1]
-                
-                self.ngram_counts[context][char] += 1
-                self.context_counts[context] += 1
-                self.vocab.add(char)
+        padded_word = self._pad(word)
+        
+        for i in range(len(padded_word) - self.n + 1):
+            ngram = padded_word[i:i + self.n]
+            yield ngram[:-1], ngram[-1]
+    
+    def _pad(self, word: str) -> str:
+        """
+        Word with n-1 start symbols and an end symbol
+        The full start padding makes the start context generate_word begins from,
+        '^' * (n - 1), a trained context, so the first characters are modelled too
+        """
+        return '^' * (self.n - 1) + word + '$'
+    
+    def train_counts(self, word_counts: Iterable[Tuple[str, int]]):
+        """
+        Train from (word, frequency) pairs, e.g. TokenizedCorpus.word_counts()
+        Each word type is counted once with its frequency as the weight, which
+        gives the same counts as training on every token
+        """
+        self._ensure_mutable()
+        for word, count in word_counts:
+            if count > 0:
+                self._train_word(word.lower(), count)
+        
+        self._invalidate_caches()
+    
+    def _train_word(self, word: str, count: int = 1):
+        """Count the character n-grams of a single lowercase word (count times)"""
+        for context, char in self._word_ngrams(word):
+            counts = self.ngram_counts[context]
+            if char not in counts:
+                self.ngram_types += 1
+            counts[char] += count
+            self.context_counts[context] += count
+            self.vocab.add(char)
+            self.continuation_counts[context].add(char)
+            self.total_chars += count
+    
+    def update(self, text_corpus: str) -> Set[str]:
+        """
+        Add new text to a trained model without retraining
+        Only the caches that depend on the changed contexts are dropped;
+        returns the contexts whose counts changed
+        """
+        return self._apply_deltas(self._ngram_deltas(text_corpus), 1)
+    
+    def remove(self, text_corpus: str) -> Set[str]:
+        """
+        Subtract text the model was trained on (e.g. retracted conversation logs)
+        Raises ValueError, leaving the model unchanged, if any n-gram of the text is not counted
+        """
+        deltas = self._ngram_deltas(text_corpus)
+        for (context, char), count in deltas.items():
+            available = self.ngram_counts[context].get(char, 0) if context in self.ngram_counts else 0
+            if available < count:
+                raise ValueError(f"Cannot remove {count} x {context + char!r}: the model has {available}")
+        return self._apply_deltas(deltas, -1)
+    
+    def _ngram_deltas(self, text_corpus: str) -> Counter:
+        """Count the (context, char) pairs of a text exactly as train() would"""
+        deltas = Counter()
+        for word in text_corpus.lower().split():
+            deltas.update(self._word_ngrams(word))
+        return deltas
+    
+    def _apply_deltas(self, deltas: Counter, sign: int) -> Set[str]:
+        """Add (sign=1) or subtract (sign=-1) n-gram counts, keeping every derived count exact"""
+        thawed = self.is_compact
+        self._ensure_mutable()
+        
+        dirty = set()
+        vocab_changed = False
+        emptied = set()
+        for (context, char), count in deltas.items():
+            delta = sign * count
+            counts = self.ngram_counts[context]
+            remaining = counts[char] + delta
+            if char not in counts:
+                self.ngram_types += 1
+            if remaining > 0:
+                counts[char] = remaining
                 self.continuation_counts[context].add(char)
-                self.total_chars += 1
+            else:
+                del counts[char]
+                self.ngram_types -= 1
+                self.continuation_counts[context].discard(char)
+                emptied.add(char)
+            
+            self.context_counts[context] += delta
+            if not counts:
+                del self.ngram_counts[context]
+                self.context_counts.pop(context, None)
+                self.continuation_counts.pop(context, None)
+            
+            if char not in self.vocab:
+                self.vocab.add(char)
+                vocab_changed = True
+            self.total_chars += delta
+            dirty.add(context)
+        
+        # A character leaves the vocabulary only once no context has it as a continuation
+        for counts in self.ngram_counts.values():
+            if not emptied:
+                break
+            emptied = {char for char in emptied if char not in counts}
+        if emptied:
+            self.vocab -= emptied
+            vocab_changed = True
+        
+        if thawed or (vocab_changed and self.smoothing == 'laplace'):
+            self._invalidate_caches()
+        else:
+            self._refresh_caches(dirty, vocab_changed)
+        return dirty
+    
+    def _refresh_caches(self, dirty: Set[str], vocab_changed: bool):
+        """
+        Drop only what depends on the changed contexts
+        A probability depends on every context in its backoff chain, so a cached
+        entry is stale when any suffix of its context changed
+        """
+        def stale(context: str) -> bool:
+            return any(context[i:] in dirty for i in range(len(context) + 1))
+        
+        self._probability_cache.discard_if(lambda key: stale(key[0]))
+        self._stats_cache.clear()
+        if vocab_changed:
+            self._sampling_tables.clear()
+            self._decoding_tables.clear()
+            self._masked_tables.clear()
+            self._engine = None
+        else:
+            for context in [context for context in self._sampling_tables if stale(context)]:
+                del self._sampling_tables[context]
+            self._decoding_tables.discard_if(lambda key: stale(key[0]))
+            self._masked_tables.discard_if(lambda key: stale(key[0]))
+            if self._engine is not None:
+                self._engine.refresh(self, dirty)
+        
+        if self._context_trie is not None:
+            self._context_trie.refresh(self.ngram_counts, self.context_counts, dirty)
+    
+    def merge(self, other: 'CharacterNGram'):
+        """Add the counts of another model of the same order (e.g. one trained on a corpus shard)"""
+        if other.n != self.n:
+            raise ValueError(f"Cannot merge a {other.n}-gram model into a {self.n}-gram model")
+        
+        self._ensure_mutable()
+        for context, counts in other.ngram_counts.items():
+            row = self.ngram_counts[context]
+            before = len(row)
+            row.update(counts)
+            self.ngram_types += len(row) - before
+        for context, count in other.context_counts.items():
+            self.context_counts[context] += count
+        for context, chars in other.continuation_counts.items():
+            self.continuation_counts[context].update(chars)
+        self.vocab.update(other.vocab)
+        self.total_chars += other.total_chars
+        
+        self._invalidate_caches()
+    
+    @property
+    def is_compact(self) -> bool:
+        """Whether the counts are frozen in compact array storage"""
+        return isinstance(self.ngram_counts, NGramCountsView)
+    
+    def compact(self) -> CompactNGramCounts:
+        """
+        Freeze the counts into compact array storage
+        ngram_counts, context_counts and continuation_counts become read-only
+        views over one CompactNGramCounts; training again thaws them
+        """
+        if self.is_compact:
+            return self.ngram_counts.store
+        
+        store = CompactNGramCounts(self.ngram_counts)
+        self.ngram_counts = store.ngram_view()
+        self.context_counts = store.context_totals_view()
+        self.continuation_counts = self.ngram_counts
+        # Rebuilt over the views on next use, so the trie does not keep the dictionaries alive
+        self._context_trie = None
+        # Top-k ties follow storage order, which compaction changes
+        self._stats_cache.clear()
+        return store
+    
+    def _ensure_mutable(self):
+        """Expand compact storage back into dictionaries before the counts change"""
+        if self.is_compact:
+            self.ngram_counts, self.context_counts, self.continuation_counts = self.ngram_counts.store.to_dicts()
+    
+    def _invalidate_caches(self):
+        """Counts changed, so every memoized probability and sampling table is stale"""
+        self._sampling_tables.clear()
+        self._decoding_tables.clear()
+        self._masked_tables.clear()
+        self._engine = None
+        self._context_trie = None
+        self._stats_cache.clear()
+        self._probability_cache.clear()
+    
+    def cache_info(self) -> Dict:
+        """Get hit/miss statistics for the probability cache and the sizes of the compiled structures"""
+        return {
+            'probability': self._probability_cache.stats(),
+            'sampling_tables': len(self._sampling_tables),
+            'decoding_tables': self._decoding_tables.stats(),
+            'masked_tables': self._masked_tables.stats(),
+            'context_trie_nodes': len(self._context_trie) if self._context_trie is not None else 0
+        }
     
     def probability(self, context: str, char: str) -> float:
         """Calculate character probability with smoothing"""
@@ -52,28 +341,49 @@ class CharacterNGram:
             return self._mle_probability(context, char)
     
     def _kneser_ney_probability(self, context: str, char: str) -> float:
-        """Kneser-Ney smoothing for character-level"""
-        if not context:
-            return self.ngram_counts[''].get(char, 0) / max(1, sum(self.ngram_counts[''].values()))
+        """
+        Kneser-Ney smoothing for character-level, memoized on (context, char)
+        An unseen context backs off unchanged, so the walk starts at its longest
+        stored suffix and follows parent pointers until a memoized level is found
+        """
+        prob = self._probability_cache.get((context, char))
+        if prob is not None:
+            return prob
         
-        discount = 0.75
-        higher_order = max(self.ngram_counts[context].get(char, 0) - discount, 0)
-        higher_order_denom = self.context_counts.get(context, 0)
+        chain = []
+        node = self.context_trie.longest_suffix(context)
+        while node is not None:
+            prob = self._probability_cache.get((node.context, char))
+            if prob is not None:
+                break
+            chain.append(node)
+            node = node.parent
         
-        continuation_count = len(self.continuation_counts[context])
-        lower_order_context = context[1:] if len(context) > 1 else ''
-        lower_order_prob = self._kneser_ney_probability(lower_order_context, char)
+        for node in reversed(chain):
+            prob = self._kneser_ney_level(node, char, prob)
+            self._probability_cache.put((node.context, char), prob)
+        self._probability_cache.put((context, char), prob)
+        if metrics.enabled:
+            metrics.observe('thetha_backoff_depth', len(chain), model='char')
+        return prob
+    
+    def _kneser_ney_level(self, node: ContextNode, char: str, lower_order_prob: Optional[float]) -> float:
+        """Kneser-Ney probability at one context given the probability of its parent"""
+        if node.parent is None:
+            return node.counts.get(char, 0) / node.total
         
-        if higher_order_denom == 0:
+        if node.total == 0:
             return lower_order_prob
-            
-        lambda_factor = (discount * continuation_count) / higher_order_denom
         
-        return (higher_order / higher_order_denom) + (lambda_factor * lower_order_prob)
+        discount = 0.75
+        higher_order = max(node.counts.get(char, 0) - discount, 0)
+        lambda_factor = (discount * node.continuation_count) / node.total
+        
+        return (higher_order / node.total) + (lambda_factor * lower_order_prob)
     
     def _laplace_probability(self, context: str, char: str) -> float:
         """Laplace smoothing for characters"""
-        numerator = self.ngram_counts[context].get(char, 0) + 1
+        numerator = self.ngram_counts.get(context, {}).get(char, 0) + 1
         denominator = self.context_counts.get(context, 0) + len(self.vocab)
         return numerator / denominator
     
@@ -83,40 +393,34 @@ class CharacterNGram:
             return 0
         return self.ngram_counts[context].get(char, 0) / self.context_counts[context]
     
-    def generate_word(self, max_length: int = 12, start_pattern: str = None, max_attempts: int = 10) -> str:
-        """Generate a Xhosa-like word with recursion protection"""
+    def generate_word(self, max_length: int = 12, start_pattern: str = None, max_attempts: int = 10,
+                      temperature: float = 1.0, top_k: Optional[int] = None, top_p: Optional[float] = None,
+                      constrained: bool = True, min_length: int = 2, rng=None) -> str:
+        """
+        Generate a Xhosa-like word with recursion protection
+        temperature / top_k / top_p reshape each step's distribution; the defaults keep plain sampling
+        With constrained, the phonotactic rules of _validate_xhosa_word are applied while
+        sampling (see phonotactics.py) and '$' cannot end a word shorter than min_length,
+        so a word is valid on the first attempt unless every continuation is masked out
+        rng is a random.Random or numpy Generator to draw from (default: the random module)
+        """
+        start = time.perf_counter() if metrics.enabled else None
+        decoding = make_decoding(temperature, top_k, top_p)
+        trie = self.context_trie
+        automaton = self._phonotactics
         for attempt in range(max_attempts):
             if start_pattern:
-                context = '^' + start_pattern
+                context = '^' * (self.n - 1) + start_pattern
                 context = context[-(self.n - 1):] 
                 generated = list(start_pattern)
             else:
                 context = '^' * (self.n - 1)
                 generated = []
+            node = trie.lookup(context)
+            state = automaton.start(start_pattern or '', min_length) if constrained else None
             
             for _ in range(max_length):
-                candidates = []
-                total_prob = 0
-                
-                for char in self.vocab:
-                    prob = self.probability(context, char)
-                    if prob > 0:
-                        candidates.append((char, prob))
-                        total_prob += prob
-                
-                if not candidates:
-                    break
-                    
-                # Weighted random selection
-                rand_val = random.uniform(0, total_prob)
-                cumulative = 0
-                selected_char = None
-                
-                for char, prob in candidates:
-                    cumulative += prob
-                    if rand_val <= cumulative:
-                        selected_char = char
-                        break
+                selected_char = self._sample_next_char(node.context, decoding, state, rng)
                 
                 if selected_char is None:
                     break
@@ -125,7 +429,9 @@ class CharacterNGram:
                     break
                     
                 generated.append(selected_char)
-                context = context[1:] + selected_char
+                node = trie.advance(node, selected_char)
+                if state is not None:
+                    state = automaton.step(state, selected_char)
                 
                 if selected_char == '$':
                     break
@@ -134,10 +440,178 @@ class CharacterNGram:
             validated_word = self._validate_xhosa_word(word)
             
             if validated_word and len(validated_word) >= 2:
+                if start is not None:
+                    record_generation('char', 'generate_word', start, attempts=attempt + 1)
                 return validated_word
         
+        if start is not None:
+            record_generation('char', 'generate_word', start, attempts=max_attempts, fallback=True)
         fallback_words = ['mholo', 'unjani', 'ndiyaphila', 'enkosi', 'kakuhle']
-        return random.choice(fallback_words)
+        return str((rng or random).choice(fallback_words))
+    
+    def _sample_next_char(self, context: str, decoding: Optional[Decoding] = None,
+                          state: Optional[int] = None, rng=None) -> Optional[str]:
+        """Draw the next character for a context (and phonotactic state id), or None if nothing can follow it"""
+        if state is not None:
+            chars, cumulative = self._masked_table(context, state, decoding)
+            if not chars:
+                return None
+            if decoding is not None:
+                return chars[draw(cumulative, rng)]
+        elif decoding is not None:
+            chars, cumulative = self._decoding_table(context, decoding)
+            return chars[draw(cumulative, rng)] if chars else None
+        elif self.compiled:
+            chars, cumulative = self._sampling_table(context)
+        else:
+            chars, cumulative = self._build_sampling_table(context)
+        
+        if not chars:
+            return None
+        
+        # Weighted random selection: one bisect over the cumulative weights
+        rand_val = (rng or random).random() * cumulative[-1]
+        index = bisect.bisect_left(cumulative, rand_val)
+        return chars[min(index, len(chars) - 1)]
+    
+    def _sampling_table(self, context: str) -> Tuple[List[str], List[float]]:
+        """
+        Get the cumulative sampling table for a context, compiling it on first use
+        Only contexts stored in the trie are cached, so client start patterns cannot grow
+        the cache; under Kneser-Ney an unseen context backs off exactly like its longest
+        stored suffix, so it shares that context's table
+        """
+        table = self._sampling_tables.get(context)
+        if table is not None:
+            return table
+        
+        trie = self.context_trie
+        if context not in trie:
+            if self.smoothing != 'kneser_ney':
+                return self._build_sampling_table(context)
+            context = trie.longest_suffix(context).context
+            table = self._sampling_tables.get(context)
+            if table is not None:
+                return table
+        table = self._build_sampling_table(context)
+        self._sampling_tables[context] = table
+        return table
+    
+    def _build_sampling_table(self, context: str) -> Tuple[List[str], List[float]]:
+        """Scan the vocabulary once and accumulate the non-zero probabilities"""
+        start = time.perf_counter() if metrics.enabled else None
+        chars = []
+        cumulative = []
+        total_prob = 0
+        
+        for char in sorted(self.vocab):
+            prob = self.probability(context, char)
+            if prob > 0:
+                total_prob += prob
+                chars.append(char)
+                cumulative.append(total_prob)
+        
+        if start is not None:
+            metrics.observe('thetha_table_build_seconds', time.perf_counter() - start, model='char')
+            metrics.observe('thetha_candidate_scan_size', len(self.vocab), model='char')
+        return chars, cumulative
+    
+    def _decoding_table(self, context: str, decoding: Decoding) -> Tuple[List[str], List[float]]:
+        """Top candidates of a context's sampling table under a decoding, compiled on first use"""
+        key = (context, decoding)
+        table = self._decoding_tables.get(key)
+        if table is None:
+            chars, cumulative = self._sampling_table(context)
+            weights = [b - a for a, b in zip([0.0] + cumulative, cumulative)]
+            indices, decoded = candidate_table(weights, decoding)
+            table = ([chars[i] for i in indices], decoded)
+            self._decoding_tables.put(key, table)
+        return table
+    
+    def _masked_table(self, context: str, state: int,
+                      decoding: Optional[Decoding] = None) -> Tuple[List[str], List[float]]:
+        """
+        A context's sampling table restricted to the characters a phonotactic state
+        (an id from self._phonotactics) allows, then reshaped by the decoding if any;
+        compiled on first use
+        """
+        key = (context, state, decoding)
+        table = self._masked_tables.get(key)
+        if table is not None:
+            return table
+        
+        chars, cumulative = self._sampling_table(context) if self.compiled else self._build_sampling_table(context)
+        kept = []
+        weights = []
+        previous = 0.0
+        for char, cum in zip(chars, cumulative):
+            if self._phonotactics.allows(state, char):
+                kept.append(char)
+                weights.append(cum - previous)
+            previous = cum
+        
+        if decoding is None:
+            table = (kept, list(accumulate(weights)))
+        else:
+            indices, decoded = candidate_table(weights, decoding)
+            table = ([kept[i] for i in indices], decoded)
+        if self.compiled:
+            self._masked_tables.put(key, table)
+        return table
+    
+    def compile_sampling_tables(self) -> int:
+        """Precompute sampling tables for every seen context and its backoff chain"""
+        contexts = set()
+        for context in list(self.ngram_counts):
+            while context:
+                contexts.add(context)
+                context = context[1:]
+        contexts.add('')
+        
+        for context in contexts:
+            self._sampling_table(context)
+        
+        return len(self._sampling_tables)
+    
+    def autocomplete(self, prefix: str, k: int = 5, max_length: int = 12,
+                     max_expansions: int = 2000) -> List[Tuple[str, float]]:
+        """
+        Most probable completions of a word prefix, as (word, probability) pairs
+        Best-first search over the per-context sampling tables, starting from the
+        same context generate_word uses for start_pattern; a completion ends when
+        the model emits '$' or the word reaches max_length characters
+        """
+        prefix = prefix.lower()
+        trie = self.context_trie
+        context = ('^' * (self.n - 1) + prefix)[-(self.n - 1):]
+        
+        # (negative probability, word, finished, node); probabilities only shrink along a path,
+        # so finished words leave the heap in order of probability
+        frontier = [(-1.0, prefix, False, trie.lookup(context))]
+        completions = []
+        expansions = 0
+        while frontier and len(completions) < k and expansions < max_expansions:
+            neg_prob, word, finished, node = heapq.heappop(frontier)
+            if finished:
+                completions.append((word, -neg_prob))
+                continue
+            if len(word) >= max_length:
+                heapq.heappush(frontier, (neg_prob, word, True, None))
+                continue
+            
+            expansions += 1
+            chars, cumulative = self._sampling_table(node.context)
+            previous = 0.0
+            for char, cum in zip(chars, cumulative):
+                prob = -neg_prob * (cum - previous) / cumulative[-1]
+                previous = cum
+                if char == '$':
+                    if word != prefix:
+                        heapq.heappush(frontier, (-prob, word, True, None))
+                else:
+                    heapq.heappush(frontier, (-prob, word + char, False, trie.advance(node, char)))
+        
+        return completions
     
     def _validate_xhosa_word(self, word: str) -> str:
         """Apply Xhosa phonological constraints WITHOUT recursion"""
@@ -172,22 +646,28 @@ class CharacterNGram:
         result = ''.join(new_word)
         return result if len(result) >= 2 else ""
     
-    def generate_multiple_words(self, count: int = 5) -> List[str]:
-        """Generate multiple Xhosa-like words"""
+    def generate_multiple_words(self, count: int = 5, rng=None) -> List[str]:
+        """
+        Generate multiple Xhosa-like words
+        For millions of words, or reproducible parallel runs, use word_generation.generate_words
+        """
         words = []
         attempts = 0
         max_total_attempts = count * 20  
         
         while len(words) < count and attempts < max_total_attempts:
-            word = self.generate_word()
+            word = self.generate_word(min_length=3, rng=rng)
             if word and len(word) >= 3:  
                 words.append(word)
             attempts += 1
         
+        if metrics.enabled and len(words) < count:
+            metrics.inc('thetha_fallback_words_total', count - len(words), model='char',
+                        caller='generate_multiple_words')
         while len(words) < count:
             fallback_words = ['mholo', 'unjani', 'ndiyaphila', 'enkosi', 'kakuhle', 
                             'sawubona', 'ngiyaphila', 'ngiyabonga', 'hamba', 'yah']
-            words.append(random.choice(fallback_words))
+            words.append(str((rng or random).choice(fallback_words)))
         
         return words[:count]
     
@@ -197,7 +677,7 @@ class CharacterNGram:
         total_chars = 0
         
         for word in test_words:
-            padded_word = '^' + word + '$'
+            padded_word = self._pad(word)
             
             for i in range(self.n - 1, len(padded_word)):
                 context = padded_word[i - self.n + 1:i]
@@ -214,21 +694,47 @@ class CharacterNGram:
         avg_log_prob = total_log_prob / total_chars
         return 2 ** (-avg_log_prob)
     
-    def get_model_stats(self) -> Dict:
-        """Get character-level model statistics"""
-        return {
+    def score_batch(self, test_words: List[str]) -> Dict:
+        """
+        Score many words at once
+        Returns per-character log2 probabilities (-inf for zero-probability
+        characters instead of silently skipping them), per-word offsets into
+        that array, aggregate perplexity and OOV / zero-probability counts
+        """
+        items = []
+        for word in test_words:
+            padded_word = self._pad(word)
+            items.append([(padded_word[i - self.n + 1:i], padded_word[i])
+                          for i in range(self.n - 1, len(padded_word))])
+        return score_token_batch(self.engine, items)
+    
+    def get_model_stats(self, k: int = 10, histograms: bool = False) -> Dict:
+        """
+        Get character-level model statistics
+        Counters are maintained during training and the top-k list is cached
+        until the counts change, so repeated calls are O(1)
+        :param histograms: also include count-of-counts and context fan-out histograms
+        """
+        stats = {
             'character_vocab_size': len(self.vocab),
-            'total_character_ngrams': sum(len(counts) for counts in self.ngram_counts.values()),
+            'total_character_ngrams': self.ngram_types,
             'unique_character_contexts': len(self.ngram_counts),
             'total_characters': self.total_chars,
-            'most_common_character_sequences': self._get_most_common_sequences(10)
+            'most_common_character_sequences': self._get_most_common_sequences(k)
         }
+        if histograms:
+            stats.update(self.count_histograms())
+        return stats
     
     def _get_most_common_sequences(self, k: int) -> List[Tuple]:
         """Get k most common character sequences"""
-        all_sequences = []
-        for context, counts in self.ngram_counts.items():
-            for char, count in counts.most_common():
-                all_sequences.append((context + char, count))
-        
-        return sorted(all_sequences, key=lambda x: x[1], reverse=True)[:k]
\ No newline at end of file
+        key = ('most_common', k)
+        if key not in self._stats_cache:
+            self._stats_cache[key] = top_ngrams(self.ngram_counts, k, lambda context, char: context + char)
+        return self._stats_cache[key]
+    
+    def count_histograms(self) -> Dict[str, Dict[int, int]]:
+        """Count-of-counts and context fan-out histograms, cached until the counts change"""
+        if 'histograms' not in self._stats_cache:
+            self._stats_cache['histograms'] = count_histograms(self.ngram_counts)
+        return self._stats_cache['histograms']
\ No newline at end of file
@@ -0,0 +1,221 @@
+import numpy as np
+from bisect import bisect_left
+from collections import defaultdict, Counter
+from collections.abc import Mapping
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+
+class CompactNGramCounts:
+    """
+    Compact, array-backed N-gram count storage
+    Tokens are interned to integer IDs and the counts are kept CSR-style:
+    context offsets -> sorted next-token IDs -> counts. Context totals and
+    continuation counts (fan-out) are derived from the arrays instead of
+    being stored a second and third time as Python objects
+    """
+
+    def __init__(self, ngram_counts: Mapping):
+        tokens = set()
+        for counts in ngram_counts.values():
+            tokens.update(counts)
+        self.id_to_token: List[Hashable] = sorted(tokens)
+        self.token_to_id: Dict[Hashable, int] = {token: i for i, token in enumerate(self.id_to_token)}
+
+        # Contexts keep their training order; empty contexts are dropped
+        self.context_index: Dict[Hashable, int] = {}
+        offsets = [0]
+        token_ids = []
+        values = []
+        for context, counts in ngram_counts.items():
+            if not counts:
+                continue
+            self.context_index[context] = len(self.context_index)
+            row = sorted((self.token_to_id[token], count) for token, count in counts.items())
+            token_ids.extend(token_id for token_id, _ in row)
+            values.extend(count for _, count in row)
+            offsets.append(len(token_ids))
+
+        id_dtype = np.int32 if len(self.id_to_token) < 2 ** 31 else np.int64
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.token_ids = np.array(token_ids, dtype=id_dtype)
+        self.counts = np.array(values, dtype=np.int64)
+        if len(self.counts):
+            self.context_totals = np.add.reduceat(self.counts, self.offsets[:-1])
+        else:
+            self.context_totals = np.zeros(0, dtype=np.int64)
+
+    def __getstate__(self) -> Dict:
+        # token_to_id is derived from id_to_token, so it is not pickled
+        state = self.__dict__.copy()
+        del state['token_to_id']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self.token_to_id = {token: i for i, token in enumerate(self.id_to_token)}
+
+    @property
+    def num_contexts(self) -> int:
+        return len(self.context_index)
+
+    @property
+    def num_ngrams(self) -> int:
+        return len(self.counts)
+
+    def nbytes(self) -> int:
+        """Size of the count arrays in bytes (excluding the interning tables)"""
+        return self.offsets.nbytes + self.token_ids.nbytes + self.counts.nbytes + self.context_totals.nbytes
+
+    def row(self, context: Hashable) -> Tuple[int, int]:
+        """Array slice [start, end) holding a context's continuations (empty if unseen)"""
+        index = self.context_index.get(context)
+        if index is None:
+            return 0, 0
+        return int(self.offsets[index]), int(self.offsets[index + 1])
+
+    def count(self, context: Hashable, token: Hashable) -> int:
+        """Count of a (context, token) pair"""
+        token_id = self.token_to_id.get(token)
+        if token_id is None:
+            return 0
+        start, end = self.row(context)
+        position = bisect_left(self.token_ids, token_id, start, end)
+        if position < end and self.token_ids[position] == token_id:
+            return int(self.counts[position])
+        return 0
+
+    def context_total(self, context: Hashable) -> int:
+        """Total count of a context (sum over its continuations)"""
+        index = self.context_index.get(context)
+        return 0 if index is None else int(self.context_totals[index])
+
+    def fanout(self, context: Hashable) -> int:
+        """Number of distinct continuations of a context"""
+        start, end = self.row(context)
+        return end - start
+
+    def ngram_view(self) -> 'NGramCountsView':
+        """Read-only stand-in for a defaultdict(Counter) of counts"""
+        return NGramCountsView(self)
+
+    def context_totals_view(self) -> 'ContextTotalsView':
+        """Read-only stand-in for a defaultdict(int) of context totals"""
+        return ContextTotalsView(self)
+
+    def to_dicts(self) -> Tuple[defaultdict, defaultdict, defaultdict]:
+        """Expand back into (ngram_counts, context_counts, continuation_counts) dictionaries"""
+        ngram_counts = defaultdict(Counter)
+        context_counts = defaultdict(int)
+        continuation_counts = defaultdict(set)
+        for context, index in self.context_index.items():
+            start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+            tokens = [self.id_to_token[token_id] for token_id in self.token_ids[start:end].tolist()]
+            ngram_counts[context] = Counter(dict(zip(tokens, self.counts[start:end].tolist())))
+            context_counts[context] = int(self.context_totals[index])
+            continuation_counts[context] = set(tokens)
+        return ngram_counts, context_counts, continuation_counts
+
+
+class RowView(Mapping):
+    """Counts of one context, behaving like a read-only Counter"""
+
+    __slots__ = ('_store', '_start', '_end')
+
+    def __init__(self, store: CompactNGramCounts, start: int, end: int):
+        self._store = store
+        self._start = start
+        self._end = end
+
+    def _position(self, token: Hashable) -> int:
+        token_id = self._store.token_to_id.get(token)
+        if token_id is None:
+            return -1
+        position = bisect_left(self._store.token_ids, token_id, self._start, self._end)
+        if position < self._end and self._store.token_ids[position] == token_id:
+            return position
+        return -1
+
+    def __getitem__(self, token: Hashable) -> int:
+        position = self._position(token)
+        if position < 0:
+            raise KeyError(token)
+        return int(self._store.counts[position])
+
+    def get(self, token: Hashable, default=None):
+        position = self._position(token)
+        return default if position < 0 else int(self._store.counts[position])
+
+    def __contains__(self, token) -> bool:
+        return self._position(token) >= 0
+
+    def __iter__(self) -> Iterator[Hashable]:
+        id_to_token = self._store.id_to_token
+        for token_id in self._store.token_ids[self._start:self._end].tolist():
+            yield id_to_token[token_id]
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def values(self) -> List[int]:
+        return self._store.counts[self._start:self._end].tolist()
+
+    def most_common(self, k: int = None) -> List[Tuple[Hashable, int]]:
+        """Continuations sorted by count, highest first"""
+        pairs = sorted(zip(self, self.values()), key=lambda x: x[1], reverse=True)
+        return pairs if k is None else pairs[:k]
+
+
+class NGramCountsView(Mapping):
+    """
+    context -> RowView mapping over a CompactNGramCounts
+    Like the defaultdict it replaces, looking up an unseen context gives an
+    empty row, but nothing is inserted. It also serves as the continuation
+    view, since len(row) is the context's fan-out
+    """
+
+    def __init__(self, store: CompactNGramCounts):
+        self.store = store
+
+    def __getitem__(self, context: Hashable) -> RowView:
+        start, end = self.store.row(context)
+        return RowView(self.store, start, end)
+
+    def get(self, context: Hashable, default=None):
+        if context not in self.store.context_index:
+            return default
+        return self[context]
+
+    def __contains__(self, context) -> bool:
+        return context in self.store.context_index
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.store.context_index)
+
+    def __len__(self) -> int:
+        return self.store.num_contexts
+
+
+class ContextTotalsView(Mapping):
+    """context -> total count mapping over a CompactNGramCounts"""
+
+    def __init__(self, store: CompactNGramCounts):
+        self.store = store
+
+    def __getitem__(self, context: Hashable) -> int:
+        if context not in self.store.context_index:
+            raise KeyError(context)
+        return self.store.context_total(context)
+
+    def get(self, context: Hashable, default=None):
+        if context not in self.store.context_index:
+            return default
+        return self.store.context_total(context)
+
+    def __contains__(self, context) -> bool:
+        return context in self.store.context_index
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.store.context_index)
+
+    def __len__(self) -> int:
+        return self.store.num_contexts
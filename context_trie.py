@@ -0,0 +1,136 @@
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+
+class ContextNode:
+    """
+    One context in a ContextTrie
+    parent is the context with its first (oldest) character dropped, so the
+    Kneser-Ney backoff chain is a walk up the parent pointers
+    """
+    __slots__ = ('context', 'parent', 'children', 'transitions', 'counts', 'total', 'continuation_count')
+
+    def __init__(self, context: str, parent: Optional['ContextNode']):
+        self.context = context
+        self.parent = parent
+        # older character -> longer context ending in this one
+        self.children: Dict[str, 'ContextNode'] = {}
+        # next character -> node of the context that follows it (memoized goto table)
+        self.transitions: Dict[str, 'ContextNode'] = {}
+        self.counts: Mapping[str, int] = {}
+        self.total = 0
+        self.continuation_count = 0
+
+    def __repr__(self) -> str:
+        return f"ContextNode({self.context!r}, total={self.total})"
+
+
+class ContextTrie:
+    """
+    Reversed-context trie over the character n-gram counts
+    A context is inserted from its last character backwards, so every suffix
+    of a stored context is a node and backoff never slices strings.
+    Generation moves between contexts through memoized per-node transitions,
+    allocating each context string once instead of once per sampled character
+    """
+
+    def __init__(self, ngram_counts: Mapping[str, Mapping[str, int]], context_counts: Mapping[str, int]):
+        self.root = ContextNode('', None)
+        self.size = 1
+        for context, counts in ngram_counts.items():
+            node = self.node(context, create=True)
+            node.counts = counts
+            node.total = context_counts.get(context, 0)
+            node.continuation_count = len(counts)
+        # The empty context normalizes by its unigram sum, never by zero
+        self.root.total = max(1, sum(self.root.counts.values()))
+        self.root.continuation_count = 0
+
+    def refresh(self, ngram_counts: Mapping[str, Mapping[str, int]], context_counts: Mapping[str, int],
+                contexts: Iterable[str]):
+        """Re-read the counts of changed contexts after an incremental update"""
+        for context in contexts:
+            node = self.node(context, create=True)
+            node.counts = ngram_counts.get(context) or {}
+            if node is self.root:
+                node.total = max(1, sum(node.counts.values()))
+            else:
+                node.total = context_counts.get(context, 0)
+                node.continuation_count = len(node.counts)
+
+    def node(self, context: str, create: bool = False) -> Optional[ContextNode]:
+        """Node of exactly this context, or None (a count-less node is created if create is set)"""
+        node = self.root
+        for i in range(len(context) - 1, -1, -1):
+            child = node.children.get(context[i])
+            if child is None:
+                if not create:
+                    return None
+                child = ContextNode(context[i:], node)
+                node.children[context[i]] = child
+                self.size += 1
+            node = child
+        return node
+
+    def longest_suffix(self, context: str) -> ContextNode:
+        """Deepest stored node whose context is a suffix of context"""
+        node = self.root
+        for i in range(len(context) - 1, -1, -1):
+            child = node.children.get(context[i])
+            if child is None:
+                break
+            node = child
+        return node
+
+    def lookup(self, context: str) -> ContextNode:
+        """
+        Node of exactly this context; an unseen context gets a detached count-less
+        node that is never added to the trie, so arbitrary user input cannot grow it
+        """
+        node = self.node(context)
+        return node if node is not None else ContextNode(context, None)
+
+    def advance(self, node: ContextNode, char: str) -> ContextNode:
+        """Node of the context after emitting char: the oldest character drops off, char is appended"""
+        target = node.transitions.get(char)
+        if target is None:
+            target = self.lookup(node.context[1:] + char)
+            # Only transitions between stored nodes are memoized
+            if target.parent is not None or target is self.root:
+                node.transitions[char] = target
+        return target
+
+    def backoff_chain(self, context: str) -> Iterator[ContextNode]:
+        """Nodes from the longest stored suffix of context up to the root"""
+        node = self.longest_suffix(context)
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def continuations(self, pattern: str) -> Counter:
+        """
+        Next-character counts after pattern, from its longest suffix that has been
+        seen as a context (e.g. 'ndi' -> what followed 'ndi', or 'di' if 'ndi' is unseen)
+        """
+        for node in self.backoff_chain(pattern):
+            if node.counts:
+                return Counter(node.counts)
+        return Counter()
+
+    def items(self, suffix: str = '') -> Iterator[Tuple[str, Mapping[str, int]]]:
+        """(context, next-character counts) for every seen context ending in suffix"""
+        start = self.node(suffix)
+        if start is None:
+            return
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node.counts:
+                yield node.context, node.counts
+            stack.extend(node.children.values())
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, context: str) -> bool:
+        return self.node(context) is not None
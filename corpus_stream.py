@@ -0,0 +1,66 @@
+import os
+from typing import Iterable, Iterator, Union
+
+# A corpus source is a file path or any iterable of text pieces (lines, chunks, sentences)
+CorpusSource = Union[str, os.PathLike, Iterable[str]]
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def _is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def iter_lines(source: CorpusSource, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Stream a corpus line by line without loading it into memory
+    A str or PathLike source is read as a file; anything else is iterated as-is
+    """
+    if _is_path(source):
+        with open(source, 'r', encoding=encoding) as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+    else:
+        for line in source:
+            yield line.rstrip('\r\n')
+
+
+def iter_chunks(source: CorpusSource, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                encoding: str = 'utf-8') -> Iterator[str]:
+    """Stream a corpus in fixed-size text chunks (files) or as the pieces of an iterable"""
+    if _is_path(source):
+        with open(source, 'r', encoding=encoding) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    else:
+        yield from source
+
+
+def iter_words(source: CorpusSource, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Stream whitespace-separated words from a corpus
+    File chunks are stitched together so a word cut at a chunk boundary is
+    yielded once, whole; pieces of an iterable are treated as separate lines
+    """
+    from_file = _is_path(source)
+    carry = ''
+
+    for chunk in iter_chunks(source, chunk_size, encoding):
+        if not from_file:
+            yield from chunk.split()
+            continue
+
+        chunk = carry + chunk
+        words = chunk.split()
+        if words and not chunk[-1].isspace():
+            carry = words.pop()
+        else:
+            carry = ''
+        yield from words
+
+    if carry:
+        yield carry
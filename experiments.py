@@ -0,0 +1,69 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from character_ngram import CharacterNGram
+from tokenized_corpus import TokenizedCorpus
+
+# (n, smoothing) pairs
+SweepConfig = Tuple[int, str]
+
+
+def count_all_orders(text_corpus: Union[str, TokenizedCorpus], max_n: int) -> Dict[int, Counter]:
+    """
+    Count character n-grams of every order up to max_n in one pass
+    Uses the same lowercasing, short-word filter and '^'/'$' padding as
+    CharacterNGram.train, so order k's counts equal a k-gram model's counts
+    (a k-gram model pads with k - 1 '^', so order k skips the extra ones).
+    Each word type is padded and sliced once, weighted by its frequency
+    """
+    if isinstance(text_corpus, TokenizedCorpus):
+        word_counts = text_corpus.word_counts()
+    else:
+        word_counts = Counter(text_corpus.split()).items()
+    
+    counts = {k: Counter() for k in range(1, max_n + 1)}
+    for word, count in word_counts:
+        word = word.lower()
+        if len(word) < 2:
+            continue
+            
+        padded_word = '^' * (max_n - 1) + word + '$'
+        for k in range(1, max_n + 1):
+            order_counts = counts[k]
+            for i in range(max_n - k, len(padded_word) - k + 1):
+                order_counts[padded_word[i:i + k]] += count
+    return counts
+
+
+def _evaluate_config(args) -> Dict:
+    """Worker: derive one model from the shared counts and score the test words"""
+    ngram_counts, n, smoothing, test_words = args
+    model = CharacterNGram.from_ngram_counts(ngram_counts, n=n, smoothing=smoothing)
+    return {
+        'n': n,
+        'smoothing': smoothing,
+        'perplexity': model.perplexity(list(test_words))
+    }
+
+
+def run_sweep(text_corpus: Union[str, TokenizedCorpus], configs: Sequence[SweepConfig], test_words: Sequence[str],
+              workers: Optional[int] = None) -> List[Dict]:
+    """
+    Evaluate many (n, smoothing) configurations of the character model
+    The corpus is counted once at the highest order; every configuration is
+    derived from those shared counts and scored in a process pool
+    (workers=1 runs inline). Results come back in config order
+    """
+    configs = list(configs)
+    if not configs:
+        return []
+    counts = count_all_orders(text_corpus, max(n for n, _ in configs))
+    jobs = [(counts[n], n, smoothing, tuple(test_words)) for n, smoothing in configs]
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        return [_evaluate_config(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_evaluate_config, jobs))
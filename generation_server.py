@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.model.ngram import generate_text
+from src.model.response_index import ResponseIndex
+from src.model.sampling import make_decoding
+
+# Models of a worker process, set once by the pool initializer
+_worker_models: Dict = {}
+
+REQUEST_KINDS = ('word', 'sentence', 'response')
+
+
+class ServerBusy(Exception):
+    """Raised when the pending-request limit is reached (backpressure)"""
+
+
+def _init_worker(char_model, sentence_model, input_to_response, ngram_model):
+    _worker_models.update({
+        'char': char_model,
+        'sentence': sentence_model,
+        'input_to_response': input_to_response,
+        'ngram': ngram_model
+    })
+
+
+def _number(params: Dict, name: str, default, kind=float):
+    """params[name] (or default) converted by kind; raises ValueError for anything else"""
+    value = params.get(name, default)
+    if value is None:
+        return None
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if isinstance(value, bool) or not math.isfinite(number):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    return number
+
+
+def _positive_int(params: Dict, name: str, default: int) -> int:
+    value = _number(params, name, default, int)
+    if value < 1:
+        raise ValueError(f"{name} must be >= 1, got {value}")
+    return value
+
+
+def _parse_params(kind: str, params: Dict) -> Dict:
+    """
+    The fields a request kind uses, type-checked and range-checked so that bad
+    input is answered with 400 before anything reaches a worker; raises ValueError
+    """
+    parsed = {
+        'temperature': _number(params, 'temperature', 1.0),
+        'top_k': _number(params, 'top_k', None, int),
+        'top_p': _number(params, 'top_p', None)
+    }
+    make_decoding(**parsed)
+
+    seed = params.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+        raise ValueError(f"seed must be an integer or a string, got {seed!r}")
+    parsed['seed'] = seed
+
+    if kind == 'word':
+        start_pattern = params.get('start_pattern')
+        if start_pattern is not None and not isinstance(start_pattern, str):
+            raise ValueError(f"start_pattern must be a string, got {start_pattern!r}")
+        parsed.update(max_length=_positive_int(params, 'max_length', 12), start_pattern=start_pattern)
+    elif kind == 'sentence':
+        start_context = params.get('start_context')
+        if start_context is not None and not (isinstance(start_context, list)
+                                              and all(isinstance(word, str) for word in start_context)):
+            raise ValueError(f"start_context must be a list of words, got {start_context!r}")
+        parsed.update(max_length=_positive_int(params, 'max_length', 20), start_context=start_context)
+    else:
+        prompt = params.get('prompt', '')
+        if not isinstance(prompt, str):
+            raise ValueError(f"prompt must be a string, got {prompt!r}")
+        parsed.update(max_words=_positive_int(params, 'max_words', 20), prompt=prompt)
+    return parsed
+
+
+def _parse_timeout(value) -> Optional[float]:
+    """A request's "timeout" in seconds (None for the service default); raises ValueError unless positive"""
+    if value is None:
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"timeout must be a number of seconds, got {value!r}")
+    if not (0 < timeout and math.isfinite(timeout)):
+        raise ValueError(f"timeout must be a positive, finite number of seconds, got {value!r}")
+    return timeout
+
+
+def _run_one(kind: str, params: Dict) -> str:
+    """Serve one request (as checked by _parse_params) with the process-local models"""
+    decoding = {name: params[name] for name in ('temperature', 'top_k', 'top_p')}
+    seed = params['seed']
+    rng = random.Random(seed) if seed is not None else None
+    if kind == 'word':
+        return _worker_models['char'].generate_word(
+            max_length=params['max_length'], start_pattern=params['start_pattern'], rng=rng, **decoding
+        )
+    if kind == 'sentence':
+        return _worker_models['sentence'].generate_sentence(
+            max_length=params['max_length'], start_context=params['start_context'], rng=rng, **decoding
+        )
+
+    key = params['prompt'].strip().lower()
+    table = _worker_models['input_to_response']
+    response = table.get(key) if table is not None else None
+    if response is None:
+        response = generate_text(_worker_models['ngram'], n=2, max_words=params['max_words'], rng=rng, **decoding)
+    return response
+
+
+def _run_batch(requests: List[Tuple[str, Dict]]) -> List[Tuple[bool, str]]:
+    """Worker: serve a micro-batch, returning (ok, result or error message) per request"""
+    results = []
+    for kind, params in requests:
+        try:
+            results.append((True, _run_one(kind, params)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class GenerationService:
+    """
+    Asyncio front for the N-gram generators
+    - identical in-flight requests with a seed are coalesced onto one future
+      (without a seed every request is its own random draw)
+    - requests are micro-batched (up to batch_size, or batch_window seconds)
+      and sampled in a process pool, so the event loop never runs model code
+    - at most max_pending distinct requests wait at once; beyond that
+      submit() raises ServerBusy, and each caller has its own timeout
+    """
+
+    def __init__(self, char_model=None, sentence_model=None, input_to_response=None, ngram_model=None,
+                 workers: Optional[int] = None, batch_size: int = 32, batch_window: float = 0.005,
+                 max_pending: int = 1024, timeout: float = 5.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # spawn, not fork: forked workers would inherit open client sockets and hold connections open
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(char_model, sentence_model, input_to_response, ngram_model)
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks, so running dispatches are held here
+        self._dispatches: Set[asyncio.Task] = set()
+        # Distinguishes the coalescing keys of seedless requests
+        self._draws = itertools.count()
+        self.stats = {'requests': 0, 'coalesced': 0, 'batches': 0, 'rejected': 0, 'timeouts': 0}
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._batch_slots = asyncio.Semaphore(self.workers)
+        # Warm the pool so the first requests do not pay for process start-up
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._executor, _run_batch, []) for _ in range(self.workers)])
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        # Let dispatched batches deliver their results before the pool goes away
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+        self._executor.shutdown(cancel_futures=True)
+
+    async def submit(self, kind: str, params: Dict, timeout: Optional[float] = None) -> str:
+        """
+        Generate one result; raises ServerBusy, asyncio.TimeoutError or ValueError
+        (for an unknown kind or, via _parse_params, a bad field)
+        """
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}")
+        # Checked again for callers that do not come through the HTTP handler
+        params = _parse_params(kind, params)
+        self.stats['requests'] += 1
+        # Only seeded requests are deterministic, so only they may share a result
+        key = (kind, json.dumps(params, sort_keys=True), None if params['seed'] is not None else next(self._draws))
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            if len(self._inflight) >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise ServerBusy(f"{self.max_pending} requests already pending")
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._queue.put_nowait((kind, params, future))
+
+        try:
+            # shield: one caller timing out must not cancel the result for coalesced callers
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._batch_slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            self.stats['batches'] += 1
+            requests = [(kind, params) for kind, params, _ in batch]
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(self._executor, _run_batch, requests)
+            except Exception as e:
+                results = [(False, f"{type(e).__name__}: {e}")] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+        finally:
+            self._batch_slots.release()
+
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error',
+                503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+async def _write_json(writer: asyncio.StreamWriter, status: int, payload: Dict):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    writer.write(head.encode('ascii') + body)
+    await writer.drain()
+
+
+def make_http_handler(service: GenerationService):
+    """Minimal HTTP/1.1 handler: POST /word, /sentence or /response with a JSON body; GET /stats"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                await _write_json(writer, 400, {'error': 'malformed request'})
+                return
+
+            method, path = request_line[0], request_line[1]
+            if method == 'GET' and path == '/stats':
+                await _write_json(writer, 200, service.stats)
+                return
+            kind = path.strip('/')
+            if method != 'POST' or kind not in REQUEST_KINDS:
+                await _write_json(writer, 404, {'error': f'no route for {method} {path}'})
+                return
+
+            try:
+                length = int(headers.get('content-length', 0))
+                if length < 0:
+                    raise ValueError
+            except ValueError:
+                await _write_json(writer, 400, {'error': 'invalid Content-Length'})
+                return
+            body = await reader.readexactly(length)
+            try:
+                params = json.loads(body or b'{}')
+                if not isinstance(params, dict):
+                    raise ValueError('body must be a JSON object')
+                timeout = _parse_timeout(params.pop('timeout', None))
+                params = _parse_params(kind, params)
+            except ValueError as e:
+                await _write_json(writer, 400, {'error': str(e)})
+                return
+
+            try:
+                result = await service.submit(kind, params, timeout=timeout)
+            except ServerBusy as e:
+                await _write_json(writer, 503, {'error': str(e)})
+            except asyncio.TimeoutError:
+                await _write_json(writer, 504, {'error': 'timed out'})
+            except RuntimeError as e:
+                await _write_json(writer, 500, {'error': str(e)})
+            else:
+                await _write_json(writer, 200, {'result': result})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(service: GenerationService, host: str = '127.0.0.1', port: int = 8080):
+    await service.start()
+    server = await asyncio.start_server(make_http_handler(service), host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    from model_setup import initialize_models
+    from src.model.binary_format import load_model_bundle
+
+    parser = argparse.ArgumentParser(description="Asyncio generation server for the N-gram models")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--response-model', help="model pickle or binary file for /response")
+    parser.add_argument('--max-pending', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    args = parser.parse_args()
+
+    char_model, sentence_model = initialize_models()
+    input_to_response, ngram_model = (load_model_bundle(args.response_model)
+                                      if args.response_model else (None, None))
+    if input_to_response is not None:
+        input_to_response = ResponseIndex(input_to_response)
+    service = GenerationService(char_model, sentence_model, input_to_response, ngram_model,
+                                workers=args.workers, max_pending=args.max_pending, timeout=args.timeout)
+    asyncio.run(serve(service, args.host, args.port))
@@ -0,0 +1,232 @@
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Set THETHA_METRICS=1 to record from startup; otherwise call metrics.enable() at runtime
+ENV_VAR = 'THETHA_METRICS'
+
+# Buckets for counts (candidates scanned, backoff levels, attempts) and for durations in seconds
+SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# name -> (type, help, buckets) for the metrics the models record
+METRICS = {
+    'thetha_candidate_scan_size': (
+        'histogram', "Vocabulary entries scanned to build one next-token distribution", SIZE_BUCKETS),
+    'thetha_backoff_depth': (
+        'histogram', "Kneser-Ney levels computed for one uncached probability or distribution", SIZE_BUCKETS),
+    'thetha_generation_attempts': (
+        'histogram', "Sampling attempts per generated word before one passed validation", SIZE_BUCKETS),
+    'thetha_generation_retries_total': (
+        'counter', "Generated words rejected by validation and sampled again", None),
+    'thetha_fallback_words_total': (
+        'counter', "Outputs replaced by a fixed fallback word after every attempt failed", None),
+    'thetha_generation_seconds': (
+        'histogram', "Wall time of one generate_word / generate_sentence call", TIME_BUCKETS),
+    'thetha_table_build_seconds': (
+        'histogram', "Wall time of building one sampling table or distribution", TIME_BUCKETS),
+    'thetha_cache_hits': ('gauge', "Hits of a model cache since it was created or its stats reset", None),
+    'thetha_cache_misses': ('gauge', "Misses of a model cache since it was created or its stats reset", None),
+    'thetha_cache_entries': ('gauge', "Entries currently held by a model cache or compiled table", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts values <= bounds[i], the last bucket is +Inf"""
+    __slots__ = ('bounds', 'bucket_counts', 'count', 'sum')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.bucket_counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, count of values <= it) pairs, Prometheus style"""
+        running = 0
+        buckets = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.bucket_counts):
+            running += count
+            buckets.append(('+Inf' if bound == float('inf') else _format_value(bound), running))
+        return buckets
+
+
+class MetricsRegistry:
+    """
+    Opt-in counters, gauges and histograms for the model hot paths
+    Call sites check `metrics.enabled` before recording, so a disabled
+    registry costs one attribute lookup per instrumented call. Cache
+    statistics are not recorded on every lookup: the LRU caches already
+    count hits and misses, and watched models are read at export time
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Drop every recorded sample (watched models stay registered)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(_metric_info(name)[2] or SIZE_BUCKETS)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the wall time of the block into a histogram (a no-op while disabled)"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+        """Register a callable producing (name, labels, value) gauge samples at export time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def watch_model(self, name: str, model):
+        """Export a model's cache_info() as cache gauges, without keeping the model alive"""
+        ref = weakref.ref(model)
+
+        def collect() -> Iterator[Tuple[str, Dict[str, str], float]]:
+            model = ref()
+            if model is None:
+                return
+            for cache, info in model.cache_info().items():
+                labels = {'model': name, 'cache': cache}
+                if isinstance(info, dict):
+                    yield 'thetha_cache_hits', labels, info['hits']
+                    yield 'thetha_cache_misses', labels, info['misses']
+                    yield 'thetha_cache_entries', labels, info['size']
+                else:
+                    yield 'thetha_cache_entries', labels, info
+
+        self.add_collector(collect)
+
+    def snapshot(self) -> Dict:
+        """Every metric as JSON-serializable data: {name: {type, help, samples}}"""
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+            histograms = [(key, histogram.cumulative(), histogram.count, histogram.sum)
+                          for key, histogram in self._histograms.items()]
+            collectors = list(self._collectors)
+        for collector in collectors:
+            gauges.extend(((name, tuple(sorted(labels.items()))), value) for name, labels, value in collector())
+
+        result: Dict[str, Dict] = {}
+
+        def family(name: str, kind: str) -> List:
+            if name not in result:
+                result[name] = {'type': kind, 'help': _metric_info(name)[1], 'samples': []}
+            return result[name]['samples']
+
+        for (name, labels), value in counters:
+            family(name, 'counter').append({'labels': dict(labels), 'value': value})
+        for (name, labels), value in gauges:
+            family(name, 'gauge').append({'labels': dict(labels), 'value': value})
+        for (name, labels), buckets, count, total in histograms:
+            family(name, 'histogram').append({'labels': dict(labels), 'buckets': dict(buckets),
+                                              'count': count, 'sum': total})
+        return dict(sorted(result.items()))
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, data in self.snapshot().items():
+            if data['help']:
+                lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            for sample in data['samples']:
+                labels = sample['labels']
+                if data['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(sample['value'])}")
+                    continue
+                for bound, count in sample['buckets'].items():
+                    lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_info(name: str) -> Tuple[str, str, Optional[Sequence[float]]]:
+    return METRICS.get(name, ('untyped', '', None))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def record_generation(model: str, kind: str, start: float, attempts: Optional[int] = None,
+                      fallback: bool = False):
+    """Record one generation call that started at time.perf_counter() value start"""
+    metrics.observe('thetha_generation_seconds', time.perf_counter() - start, model=model, kind=kind)
+    if attempts is not None:
+        metrics.observe('thetha_generation_attempts', attempts, model=model)
+        if attempts > 1:
+            metrics.inc('thetha_generation_retries_total', attempts - 1, model=model)
+    if fallback:
+        metrics.inc('thetha_fallback_words_total', model=model, caller=kind)
+
+
+def _env_enabled() -> bool:
+    return os.environ.get(ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+# Process-wide registry shared by every model
+metrics = MetricsRegistry(enabled=_env_enabled())
@@ -1,30 +1,57 @@
 import streamlit as st
 import matplotlib.pyplot as plt
-from character_ngram import CharacterNGram
-from sentence_ngram import SentenceNGram
-from word_corpus import get_word_corpus
+from experiments import run_sweep
+from model_setup import get_char_corpus, initialize_models
+from instrumentation import ENV_VAR, metrics
 
-def initialize_models():
-    """Initialize and train both models"""
-    corpus = get_word_corpus()
-    
-    # Train Character N-gram
-    char_model = CharacterNGram(n=4, smoothing='kneser_ney')
-    char_model.train(corpus)
-    
-    # Train Sentence N-gram
-    sentence_model = SentenceNGram(n=3, smoothing='kneser_ney')
-    # Use conversations from the corpus as training sentences
-    conversations = [
-        "Mholo unjani", "Ndiyaphila enkosi", "Ungubani igama lakho",
-        "Ndivela eKapa", "Ndihlala eGoli", "Ewe ndiyasebenza",
-        "Usapho lwam luyaphila", "Wamkelekile", "Ndithanda ukufunda",
-        "Kulungile", "Ewe ndiyasithanda", "Ndiya edolophini"
-    ]
-    sentence_model.train(conversations)
-    
+@st.cache_data(show_spinner="Running experiment sweep...")
+def run_experiment(configs, test_words):
+    """Sweep results are cached, so reruns only render them; the sweep runs on the served model's corpus"""
+    return run_sweep(get_char_corpus(), configs, test_words)
+
+@st.cache_resource(show_spinner="Loading Xhosa N-gram models...")
+def get_models():
+    """Models shared by every session in this process"""
+    char_model, sentence_model = initialize_models()
+    metrics.watch_model('char', char_model)
+    metrics.watch_model('sentence', sentence_model)
     return char_model, sentence_model
 
+def show_debug_metrics():
+    """Hot-path metrics of this process: histogram summaries, counters, cache gauges and exports"""
+    st.markdown("---")
+    st.subheader("Debug: Hot-path Metrics")
+    st.caption(f"Recording is on for every session of this process; start the app with {ENV_VAR}=1 "
+               "to record from startup")
+    snapshot = metrics.snapshot()
+    
+    rows = []
+    for name, family in snapshot.items():
+        for sample in family['samples']:
+            labels = ', '.join(f"{key}={value}" for key, value in sample['labels'].items())
+            if family['type'] == 'histogram':
+                mean = sample['sum'] / sample['count'] if sample['count'] else 0.0
+                rows.append({'metric': name, 'labels': labels, 'count': sample['count'], 'value': mean})
+            else:
+                rows.append({'metric': name, 'labels': labels, 'count': None, 'value': sample['value']})
+    if rows:
+        st.caption("Histograms show their observation count and mean value")
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info("No metrics recorded yet")
+    
+    export_col1, export_col2, export_col3 = st.columns(3)
+    with export_col1:
+        st.download_button("Download Prometheus text", metrics.to_prometheus(),
+                           file_name="metrics.prom", mime="text/plain")
+    with export_col2:
+        st.download_button("Download JSON", metrics.to_json(indent=2),
+                           file_name="metrics.json", mime="application/json")
+    with export_col3:
+        if st.button("Reset Metrics"):
+            metrics.reset()
+            st.experimental_rerun()
+
 def main():
     st.set_page_config(
         page_title="Xhosa N-gram Model Comparison",
@@ -37,14 +64,19 @@ def main():
     Compare Character-level vs Sentence-level N-gram models for Xhosa language generation
     """)
     
-    # Initialize models
+    # Initialize models (loaded once per process, shared across sessions)
     if 'char_model' not in st.session_state:
-        with st.spinner("Training Xhosa N-gram models..."):
-            st.session_state.char_model, st.session_state.sentence_model = initialize_models()
-        st.success("Models trained successfully!")
+        st.session_state.char_model, st.session_state.sentence_model = get_models()
     
     # Sidebar
     st.sidebar.header("Configuration")
+    # Recording is process-wide, so a session may switch it on but never off for the others
+    if metrics.enabled:
+        st.sidebar.caption("Debug metrics: recording (process-wide)")
+    elif st.sidebar.button("Record debug metrics",
+                           help="Instrument generation and scoring hot paths for every session of this process"):
+        metrics.enable()
+        st.experimental_rerun()
     
     # Main content
     col1, col2 = st.columns([2, 1])
@@ -163,14 +195,9 @@ def main():
         
         if st.button("Compare N-gram Orders"):
             n_values = [2, 3, 4]
-            perplexities = []
-            
-            for n in n_values:
-                test_model = CharacterNGram(n=n)
-                test_model.train(get_word_corpus())
-                test_words = ["mholo", "unjani", "ndiyaphila"]
-                perplexity = test_model.perplexity(test_words)
-                perplexities.append(perplexity)
+            test_words = ("mholo", "unjani", "ndiyaphila")
+            results = run_experiment(tuple((n, 'kneser_ney') for n in n_values), test_words)
+            perplexities = [result['perplexity'] for result in results]
             
             # Plot results
             fig, ax = plt.subplots(figsize=(8, 4))
@@ -191,14 +218,9 @@ def main():
         
         if st.button("Compare Smoothing Methods"):
             methods = ['kneser_ney', 'laplace', 'mle']
-            perplexities = []
-            
-            for method in methods:
-                test_model = CharacterNGram(n=3, smoothing=method)
-                test_model.train(get_word_corpus())
-                test_words = ["mholo", "unjani", "ndiyaphila"]
-                perplexity = test_model.perplexity(test_words)
-                perplexities.append(perplexity)
+            test_words = ("mholo", "unjani", "ndiyaphila")
+            results = run_experiment(tuple((3, method) for method in methods), test_words)
+            perplexities = [result['perplexity'] for result in results]
             
             # Plot results
             fig, ax = plt.subplots(figsize=(8, 4))
@@ -222,18 +244,16 @@ def main():
     
     with data_col1:
         st.write("**Word Corpus Info**")
-        corpus = get_word_corpus()
-        words = corpus.split()
-        unique_words = set(words)
+        corpus = get_char_corpus()
         
-        st.write(f"Total words: {len(words)}")
-        st.write(f"Unique words: {len(unique_words)}")
-        st.write(f"Average word length: {sum(len(word) for word in words) / len(words):.1f} chars")
+        st.write(f"Total words: {len(corpus)}")
+        st.write(f"Unique words: {corpus.num_types}")
+        st.write(f"Average word length: {corpus.total_chars / len(corpus):.1f} chars")
         
         # Word length distribution
-        word_lengths = [len(word) for word in words]
+        # Per word type weighted by frequency, so a large external corpus is never expanded per token
         fig, ax = plt.subplots(figsize=(8, 4))
-        ax.hist(word_lengths, bins=15, alpha=0.7, color='skyblue')
+        ax.hist(corpus.type_lengths, bins=15, weights=corpus.counts, alpha=0.7, color='skyblue')
         ax.set_xlabel('Word Length')
         ax.set_ylabel('Frequency')
         ax.set_title('Word Length Distribution')
@@ -242,11 +262,14 @@ def main():
     
     with data_col2:
         st.write("**Sample Training Data**")
-        corpus = get_word_corpus()
-        sample_words = list(set(corpus.split()))[:20]  # First 20 unique words
+        corpus = get_char_corpus()
+        sample_words = corpus.vocab[:20]  # First 20 unique words
         st.write("Sample vocabulary:")
         for word in sample_words:
             st.write(f"`{word}`")
+    
+    if metrics.enabled:
+        show_debug_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
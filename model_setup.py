@@ -0,0 +1,59 @@
+import os
+from typing import Optional
+from character_ngram import CharacterNGram
+from sentence_ngram import SentenceNGram
+from word_corpus import get_word_tokens
+from model_store import load_or_train
+from tokenized_corpus import TokenizedCorpus, load_corpus
+
+# Path of an external word corpus (any size) to train the character model on instead of the built-in one
+CORPUS_ENV_VAR = 'THETHA_CORPUS'
+
+# Conversations used as training sentences for the sentence model
+SENTENCE_TRAINING_DATA = [
+    "Mholo unjani", "Ndiyaphila enkosi", "Ungubani igama lakho",
+    "Ndivela eKapa", "Ndihlala eGoli", "Ewe ndiyasebenza",
+    "Usapho lwam luyaphila", "Wamkelekile", "Ndithanda ukufunda",
+    "Kulungile", "Ewe ndiyasithanda", "Ndiya edolophini"
+]
+
+CHAR_MODEL_CONFIG = {'model': 'CharacterNGram', 'n': 4, 'smoothing': 'kneser_ney'}
+SENTENCE_MODEL_CONFIG = {'model': 'SentenceNGram', 'n': 3, 'smoothing': 'kneser_ney'}
+
+def train_char_model(corpus):
+    """Train the Character N-gram on a TokenizedCorpus (per word type) or on raw text"""
+    char_model = CharacterNGram(n=CHAR_MODEL_CONFIG['n'], smoothing=CHAR_MODEL_CONFIG['smoothing'])
+    if isinstance(corpus, TokenizedCorpus):
+        char_model.train_counts(corpus.word_counts())
+    else:
+        char_model.train(corpus)
+    char_model.compact()
+    return char_model
+
+def train_sentence_model(sentences):
+    """Train the Sentence N-gram"""
+    sentence_model = SentenceNGram(n=SENTENCE_MODEL_CONFIG['n'], smoothing=SENTENCE_MODEL_CONFIG['smoothing'],
+                                   vectorized=True)
+    sentence_model.train(sentences)
+    sentence_model.compact()
+    return sentence_model
+
+def get_char_corpus(corpus_path: Optional[str] = None) -> TokenizedCorpus:
+    """
+    Word corpus the character model is trained on: corpus_path, else $THETHA_CORPUS,
+    else the built-in corpus (each tokenized once per process)
+    """
+    corpus_path = corpus_path or os.environ.get(CORPUS_ENV_VAR)
+    return load_corpus(corpus_path) if corpus_path else get_word_tokens()
+
+def initialize_models(corpus_path: Optional[str] = None):
+    """
+    Load both models from the on-disk store, training only when the corpus or config changed
+    :param corpus_path: external word corpus file for the character model (see get_char_corpus)
+    """
+    corpus = get_char_corpus(corpus_path)
+    char_model = load_or_train('character', corpus.chunks(), CHAR_MODEL_CONFIG,
+                               lambda: train_char_model(corpus))
+    sentence_model = load_or_train('sentence', SENTENCE_TRAINING_DATA, SENTENCE_MODEL_CONFIG,
+                                   lambda: train_sentence_model(SENTENCE_TRAINING_DATA))
+    return char_model, sentence_model
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Union
+
+# Bump when the model classes change in a way that makes old pickles unusable
+MODEL_STORE_VERSION = 4
+DEFAULT_CACHE_DIR = Path(os.environ.get('THETHA_MODEL_CACHE', '.model_cache'))
+
+
+def fingerprint(corpus: Union[str, Iterable[str]], config: Dict) -> str:
+    """Content hash of a training corpus plus the model hyperparameters"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': MODEL_STORE_VERSION, 'config': config}, sort_keys=True).encode('utf-8'))
+    pieces = [corpus] if isinstance(corpus, str) else corpus
+    for piece in pieces:
+        encoded = piece.encode('utf-8')
+        # Length-prefix each piece so ["ab", "c"] and ["a", "bc"] hash differently
+        digest.update(len(encoded).to_bytes(8, 'little'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def model_path(name: str, key: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"{name}-{key[:16]}.pkl"
+
+
+def save_model(model, path: Path):
+    """Pickle a model atomically, so a concurrent reader never sees a partial file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_or_train(name: str, corpus: Union[str, Iterable[str]], config: Dict,
+                  build: Callable[[], object], cache_dir: Path = DEFAULT_CACHE_DIR):
+    """
+    Load a trained model from disk, or build and save it
+    The file is keyed on the corpus content and config, so a model is only
+    retrained when either changes; unreadable files are rebuilt
+    """
+    path = model_path(name, fingerprint(corpus, config), cache_dir)
+    if path.exists():
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+
+    model = build()
+    try:
+        save_model(model, path)
+    except OSError:
+        # A read-only deployment still works, it just retrains per process
+        pass
+    return model
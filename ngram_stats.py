@@ -0,0 +1,37 @@
+import heapq
+from collections import Counter
+from operator import itemgetter
+from typing import Callable, Dict, Hashable, List, Mapping, Tuple
+
+
+def top_ngrams(ngram_counts: Mapping[Hashable, Mapping[Hashable, int]], k: int,
+               join: Callable[[Hashable, Hashable], Hashable]) -> List[Tuple[Hashable, int]]:
+    """
+    k most frequent n-grams as (join(context, token), count), highest first
+    Counts stream through heapq.nlargest, so selection is O(N log k) and only
+    the k winners are joined into n-gram strings / tuples. nlargest matches a
+    stable sort, so ties keep their order in the counts
+    """
+    entries = (
+        (context, token, count)
+        for context, counts in ngram_counts.items()
+        for token, count in zip(counts, counts.values())
+    )
+    return [(join(context, token), count) for context, token, count in heapq.nlargest(k, entries, key=itemgetter(2))]
+
+
+def count_histograms(ngram_counts: Mapping[Hashable, Mapping[Hashable, int]]) -> Dict[str, Dict[int, int]]:
+    """
+    Count-of-counts (how many n-gram types occur c times) and context fan-out
+    (how many contexts have f distinct continuations), in one pass
+    """
+    count_of_counts = Counter()
+    fanout = Counter()
+    for counts in ngram_counts.values():
+        if counts:
+            fanout[len(counts)] += 1
+            count_of_counts.update(counts.values())
+    return {
+        'count_of_counts': dict(sorted(count_of_counts.items())),
+        'context_fanout': dict(sorted(fanout.items()))
+    }
@@ -0,0 +1,95 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+from character_ngram import CharacterNGram
+from sentence_ngram import SentenceNGram
+from corpus_stream import CorpusSource, iter_lines, iter_words
+
+DEFAULT_SHARD_SIZE = 50000
+
+
+def _shards(items: Iterable, shard_size: int) -> Iterator[List]:
+    """Split a stream into consecutive lists of at most shard_size items"""
+    iterator = iter(items)
+    while True:
+        shard = list(islice(iterator, shard_size))
+        if not shard:
+            return
+        yield shard
+
+
+def _ordered_parallel_map(fn: Callable, shards: Iterable, workers: int) -> Iterator:
+    """
+    Map fn over shards in a process pool, yielding results in shard order
+    At most 2 * workers shards are in flight, so a streamed corpus is never fully materialized
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for shard in shards:
+            pending.append(executor.submit(fn, shard))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _count_character_shard(args) -> CharacterNGram:
+    """Worker: count the character n-grams of one shard of lowercase words"""
+    n, words = args
+    shard_model = CharacterNGram(n=n, cache_size=0)
+    for word in words:
+        shard_model._train_word(word)
+    return shard_model
+
+
+def _count_sentence_shard(args) -> SentenceNGram:
+    """Worker: count the word n-grams of one shard of lines"""
+    n, lines = args
+    shard_model = SentenceNGram(n=n, cache_size=0)
+    for line in lines:
+        shard_model._train_line(line)
+    return shard_model
+
+
+def train_character_parallel(model: CharacterNGram, corpus: Union[str, CorpusSource],
+                             workers: Optional[int] = None,
+                             shard_size: int = DEFAULT_SHARD_SIZE) -> CharacterNGram:
+    """
+    Train a CharacterNGram with one counting process per core
+    A str corpus is the text itself (as for train()); a PathLike or any other
+    iterable is streamed (as for train_stream()). Shards are merged in order,
+    so the counts are identical to serial training
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(corpus, str):
+        words = iter(corpus.lower().split())
+    else:
+        words = (word.lower() for word in iter_words(corpus))
+
+    shards = ((model.n, shard) for shard in _shards(words, shard_size))
+    for shard_model in _ordered_parallel_map(_count_character_shard, shards, workers):
+        model.merge(shard_model)
+    return model
+
+
+def train_sentence_parallel(model: SentenceNGram, sentences: Union[List[str], CorpusSource],
+                            workers: Optional[int] = None,
+                            shard_size: int = DEFAULT_SHARD_SIZE) -> SentenceNGram:
+    """
+    Train a SentenceNGram with one counting process per core
+    sentences is a list of sentences / conversation pairs (as for train()) or a
+    file path; shards are merged in order, so the counts are identical to serial training
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(sentences, (str, os.PathLike)):
+        lines = (line for line in iter_lines(sentences) if line.strip())
+    else:
+        lines = iter(sentences)
+
+    shards = ((model.n, shard) for shard in _shards(lines, shard_size))
+    for shard_model in _ordered_parallel_map(_count_sentence_shard, shards, workers):
+        model.merge(shard_model)
+    return model
@@ -0,0 +1,109 @@
+import threading
+from typing import Dict, List, NamedTuple
+
+VOWELS = frozenset('aeiou')
+CONSONANTS = frozenset('bcdfghjklmnpqrstvwxyz')
+# Consonants that may not open a word doubled ('bb...', 'dd...'; 'cc' is allowed)
+NO_DOUBLED_START = frozenset('bdfghjklmnpqrstvwxyz')
+MAX_VOWEL_RUN = 3
+MAX_CONSONANT_RUN = 2
+END = '$'
+
+
+class PhonotacticState(NamedTuple):
+    """
+    State of the word-shape automaton after some characters
+    length is capped at min_length, since past it only the runs matter; that
+    keeps the state space (and the masked tables keyed on it) small
+    """
+    min_length: int
+    length: int
+    # The first character while the word has exactly one, else ''
+    first: str
+    vowels: int
+    consonants: int
+
+
+def advance(state: PhonotacticState, char: str) -> PhonotacticState:
+    """
+    State after emitting char
+    A vowel resets the consonant run and vice versa; any other character
+    leaves both runs as they are, matching CharacterNGram._validate_xhosa_word
+    """
+    length = min(state.length + 1, max(state.min_length, 2))
+    first = char if state.length == 0 else ''
+    if char in VOWELS:
+        return state._replace(length=length, first=first, vowels=state.vowels + 1, consonants=0)
+    if char in CONSONANTS:
+        return state._replace(length=length, first=first, vowels=0, consonants=state.consonants + 1)
+    return state._replace(length=length, first=first)
+
+
+def allows(state: PhonotacticState, char: str) -> bool:
+    """Whether char may follow, so that the finished word passes validation unchanged"""
+    if char == END:
+        return state.length >= state.min_length
+    if char in VOWELS:
+        return state.vowels < MAX_VOWEL_RUN
+    if char in CONSONANTS:
+        if state.length == 1 and char == state.first and char in NO_DOUBLED_START:
+            return False
+        return state.consonants < MAX_CONSONANT_RUN
+    return True
+
+
+class PhonotacticAutomaton:
+    """
+    Finite-state mask over the next character of a generated word
+    States are interned as small integers with memoized transitions, so the
+    generation loop advances with one dict lookup per character and callers
+    can key per-state tables on (context, state id)
+    """
+
+    def __init__(self):
+        self.states: List[PhonotacticState] = []
+        self._ids: Dict[PhonotacticState, int] = {}
+        # state id -> {char: next state id}
+        self._transitions: List[Dict[str, int]] = []
+        # Ids are list positions, so new states are added under a lock (lookups need none)
+        self._lock = threading.Lock()
+
+    def _intern(self, state: PhonotacticState) -> int:
+        state_id = self._ids.get(state)
+        if state_id is None:
+            with self._lock:
+                state_id = self._ids.get(state)
+                if state_id is None:
+                    state_id = len(self.states)
+                    self.states.append(state)
+                    self._transitions.append({})
+                    self._ids[state] = state_id
+        return state_id
+
+    def start(self, prefix: str = '', min_length: int = 2) -> int:
+        """State id after the characters of prefix (e.g. a generate_word start pattern)"""
+        state_id = self._intern(PhonotacticState(min_length, 0, '', 0, 0))
+        for char in prefix:
+            state_id = self.step(state_id, char)
+        return state_id
+
+    def step(self, state_id: int, char: str) -> int:
+        """State id after emitting char"""
+        next_id = self._transitions[state_id].get(char)
+        if next_id is None:
+            next_id = self._intern(advance(self.states[state_id], char))
+            self._transitions[state_id][char] = next_id
+        return next_id
+
+    def allows(self, state_id: int, char: str) -> bool:
+        return allows(self.states[state_id], char)
+
+    def __getstate__(self) -> Dict:
+        # Locks cannot be pickled; a restored automaton gets a fresh one
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
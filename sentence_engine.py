@@ -0,0 +1,211 @@
+import time
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+from lru_cache import LRUCache
+from src.model.sampling import Decoding, candidate_table, draw
+from instrumentation import metrics
+
+
+class SentenceScoringEngine:
+    """
+    Vectorized scoring engine for the Sentence-Level N-Gram Model
+    Keeps the counts as integer word IDs in NumPy arrays so a whole
+    smoothed distribution is computed in one pass over the vocabulary.
+    Contexts only need slicing and truthiness, so the character model's
+    string contexts work too
+    """
+
+    def __init__(self, model, discount: float = 0.75, seed: Optional[int] = None,
+                 cache_size: Optional[int] = 100000):
+        self.n = model.n
+        self.smoothing = model.smoothing
+        self.discount = discount
+        self.rng = np.random.default_rng(seed)
+        # Whole-vocabulary distributions are large, so keep far fewer of them than scalar probabilities
+        self.distribution_cache = LRUCache(None if cache_size is None else min(cache_size, 1024))
+        # (context, decoding) -> (candidate word IDs, cumulative probabilities), sized by top_k not the vocabulary
+        self.decoding_cache = LRUCache(cache_size)
+
+        # Interned vocabulary: word <-> integer ID
+        self.id_to_word: List[str] = sorted(model.vocab)
+        self.word_to_id: Dict[str, int] = {word: i for i, word in enumerate(self.id_to_word)}
+        self.vocab_size = len(self.id_to_word)
+
+        # context -> (sorted next-word IDs, counts), plus the per-context totals
+        self.context_arrays: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
+        self.context_totals: Dict[Tuple[str, ...], int] = {}
+
+        for context, counts in model.ngram_counts.items():
+            self._load_context(context, counts)
+
+    def _load_context(self, context, counts):
+        """Store one context's counts as sorted ID / count arrays (or forget the context if empty)"""
+        if not counts:
+            self.context_arrays.pop(context, None)
+            self.context_totals.pop(context, None)
+            return
+        ids = np.fromiter((self.word_to_id[word] for word in counts), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        order = np.argsort(ids)
+        self.context_arrays[context] = (ids[order], values[order])
+        self.context_totals[context] = int(values.sum())
+
+    def refresh(self, model, contexts) -> int:
+        """
+        Re-read the counts of changed contexts after an incremental update
+        The vocabulary must be unchanged (otherwise build a new engine). Cached
+        distributions are dropped only where a changed context is in their
+        backoff chain; returns how many cached entries were dropped
+        """
+        contexts = set(contexts)
+        for context in contexts:
+            self._load_context(context, model.ngram_counts.get(context))
+
+        def stale(context) -> bool:
+            return any(context[i:] in contexts for i in range(len(context) + 1))
+
+        return (self.distribution_cache.discard_if(stale)
+                + self.decoding_cache.discard_if(lambda key: stale(key[0])))
+
+    def distribution(self, context: Tuple[str, ...]) -> np.ndarray:
+        """Smoothed probability of every vocabulary word after a context (read-only, memoized)"""
+        if isinstance(context, list):
+            context = tuple(context)
+        probs = self.distribution_cache.get(context)
+        if probs is not None:
+            return probs
+
+        start = time.perf_counter() if metrics.enabled else None
+        if self.smoothing == 'kneser_ney':
+            probs = self._kneser_ney_distribution(context)
+        elif self.smoothing == 'laplace':
+            probs = self._laplace_distribution(context)
+        else:
+            probs = self._mle_distribution(context)
+        if start is not None:
+            metrics.observe('thetha_table_build_seconds', time.perf_counter() - start, model='engine')
+            metrics.observe('thetha_candidate_scan_size', self.vocab_size, model='engine')
+            if self.smoothing == 'kneser_ney':
+                metrics.observe('thetha_backoff_depth', len(context) + 1, model='engine')
+
+        probs.flags.writeable = False
+        self.distribution_cache.put(context, probs)
+        return probs
+
+    def _kneser_ney_distribution(self, context: Tuple[str, ...]) -> np.ndarray:
+        """Kneser-Ney smoothing over the whole vocabulary, lowest order first"""
+        if not context:
+            probs = np.zeros(self.vocab_size)
+            entry = self.context_arrays.get(context)
+            if entry is not None:
+                ids, counts = entry
+                probs[ids] = counts / max(1, self.context_totals[context])
+            return probs
+
+        probs = self._kneser_ney_distribution(context[1:])
+        entry = self.context_arrays.get(context)
+        if entry is None:
+            return probs
+
+        ids, counts = entry
+        denom = self.context_totals[context]
+        lambda_factor = (self.discount * len(ids)) / denom
+        probs *= lambda_factor
+        probs[ids] += np.maximum(counts - self.discount, 0) / denom
+        return probs
+
+    def _laplace_distribution(self, context: Tuple[str, ...]) -> np.ndarray:
+        """Add-one smoothing over the whole vocabulary"""
+        denom = self.context_totals.get(context, 0) + self.vocab_size
+        numerators = np.ones(self.vocab_size)
+        entry = self.context_arrays.get(context)
+        if entry is not None:
+            ids, counts = entry
+            numerators[ids] += counts
+        return numerators / denom
+
+    def _mle_distribution(self, context: Tuple[str, ...]) -> np.ndarray:
+        """Maximum likelihood over the whole vocabulary"""
+        probs = np.zeros(self.vocab_size)
+        entry = self.context_arrays.get(context)
+        if entry is not None:
+            ids, counts = entry
+            probs[ids] = counts / self.context_totals[context]
+        return probs
+
+    def probability(self, context: Tuple[str, ...], word: str) -> float:
+        """Probability of a single word, without building the full distribution"""
+        if isinstance(context, list):
+            context = tuple(context)
+        word_id = self.word_to_id.get(word)
+
+        if self.smoothing == 'laplace':
+            count = 0 if word_id is None else self._count(context, word_id)
+            return (count + 1) / (self.context_totals.get(context, 0) + self.vocab_size)
+
+        if word_id is None:
+            return 0
+        if self.smoothing == 'kneser_ney':
+            return self._kneser_ney_probability(context, word_id)
+
+        total = self.context_totals.get(context, 0)
+        if total == 0:
+            return 0
+        return self._count(context, word_id) / total
+
+    def _kneser_ney_probability(self, context: Tuple[str, ...], word_id: int) -> float:
+        """Scalar Kneser-Ney probability using binary search into the count arrays"""
+        if not context:
+            return self._count(context, word_id) / max(1, self.context_totals.get(context, 0))
+
+        lower_order_prob = self._kneser_ney_probability(context[1:], word_id)
+        denom = self.context_totals.get(context, 0)
+        if denom == 0:
+            return lower_order_prob
+
+        higher_order = max(self._count(context, word_id) - self.discount, 0)
+        lambda_factor = (self.discount * len(self.context_arrays[context][0])) / denom
+        return (higher_order / denom) + (lambda_factor * lower_order_prob)
+
+    def _count(self, context: Tuple[str, ...], word_id: int) -> int:
+        """Count of a (context, word ID) pair"""
+        entry = self.context_arrays.get(context)
+        if entry is None:
+            return 0
+        ids, counts = entry
+        index = np.searchsorted(ids, word_id)
+        if index < len(ids) and ids[index] == word_id:
+            return int(counts[index])
+        return 0
+
+    def sample(self, context: Tuple[str, ...], decoding: Optional[Decoding] = None, rng=None) -> Optional[str]:
+        """
+        Sample the next word after a context, or None if every word has zero probability
+        With a decoding (temperature / top-k / top-p) the draw comes from the
+        context's compiled candidate table instead of the whole distribution
+        rng is a random.Random or numpy Generator to draw from (default: the engine's generator)
+        """
+        if decoding is not None:
+            ids, cumulative = self.decoding_table(context, decoding)
+            if len(ids) == 0:
+                return None
+            return self.id_to_word[ids[draw(cumulative, rng or self.rng)]]
+
+        probs = self.distribution(context)
+        total = probs.sum()
+        if total <= 0:
+            return None
+        if rng is not None:
+            return self.id_to_word[draw(np.cumsum(probs), rng)]
+        return self.id_to_word[self.rng.choice(self.vocab_size, p=probs / total)]
+
+    def decoding_table(self, context: Tuple[str, ...], decoding: Decoding) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate word IDs and cumulative probabilities of a context under a decoding (memoized)"""
+        if isinstance(context, list):
+            context = tuple(context)
+        key = (context, decoding)
+        table = self.decoding_cache.get(key)
+        if table is None:
+            table = candidate_table(self.distribution(context), decoding)
+            self.decoding_cache.put(key, table)
+        return table
@@ -1,8 +1,19 @@
 import math
 import random
+import time
 from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Set
+from typing import Iterator, List, Dict, Tuple, Set, Optional
 import re
+from sentence_engine import SentenceScoringEngine
+from lru_cache import LRUCache
+from compact_counts import CompactNGramCounts, NGramCountsView
+from corpus_stream import CorpusSource, iter_lines
+from batch_scoring import score_token_batch
+from beam_search import beam_search
+from ngram_stats import count_histograms, top_ngrams
+from xhosa_segmenter import default_segmenter
+from src.model.sampling import make_decoding
+from instrumentation import metrics, record_generation
 
 class SentenceNGram:
     """
@@ -10,75 +21,249 @@ class SentenceNGram:
     Focuses on generating complete, syntactically coherent sentences
     """
     
-    def __init__(self, n: int = 3, smoothing: str = 'kneser_ney'):
+    def __init__(self, n: int = 3, smoothing: str = 'kneser_ney', vectorized: bool = False,
+                 cache_size: Optional[int] = 100000):
         self.n = n
         self.smoothing = smoothing
+        self.vectorized = vectorized
         self.ngram_counts = defaultdict(Counter)
         self.context_counts = defaultdict(int)
         self.vocab: Set[str] = set()
         self.continuation_counts = defaultdict(set)
         self.total_tokens = 0
-        self.start_tokens = []
+        # Distinct (context, word) n-grams, kept current as counts change so stats never rescan
+        self.ngram_types = 0
+        self.start_tokens = Counter()  # sentence starter -> count, so memory tracks vocabulary, not corpus size
+        self.cache_size = cache_size
+        self._engine = None
+        # Memoized Kneser-Ney probabilities keyed on (context, word) and per-context normalizers
+        self._probability_cache = LRUCache(cache_size)
+        self._normalizer_cache = LRUCache(cache_size)
+        # Top-k lists and histograms computed since the counts last changed
+        self._stats_cache: Dict = {}
+        
+    @property
+    def engine(self) -> SentenceScoringEngine:
+        """Vectorized scoring engine, rebuilt lazily after training"""
+        if self._engine is None:
+            self._engine = SentenceScoringEngine(self, cache_size=self.cache_size)
+        return self._engine
         
     def preprocess_xhosa_sentence(self, text: str) -> List[str]:
-        """Advanced Xhosa-specific sentence preprocessing"""
-        # Convert to lowercase but preserve proper nouns and sentence structure
-        text = text.lower()
-        
-        # Preserve Xhosa-specific characters and diacritics
-        text = re.sub(r'[^\w\s\u00C0-\u00FF\u0100-\u017F]', '', text)  # Keep letters, numbers, whitespace, and extended Latin
-        
-        # Tokenize while preserving Xhosa morphological boundaries
-        tokens = text.split()
-        
-        # Enhanced tokenization for agglutinative language
-        processed_tokens = []
-        for token in tokens:
-            if len(token) > 8:  # Likely agglutinated word
-                # Simple morphological segmentation for common Xhosa patterns
-                segments = self.morphological_segment(token)
-                processed_tokens.extend(segments)
-            else:
-                processed_tokens.append(token)
-                
-        return processed_tokens
+        """
+        Advanced Xhosa-specific sentence preprocessing
+        Lowercases, strips punctuation and segments likely agglutinated words
+        (longer than 8 characters) with the shared, memoized XhosaSegmenter
+        """
+        return default_segmenter.tokenize(text)
+    
+    def preprocess_batch(self, sentences: List[str]) -> List[List[str]]:
+        """Preprocess many sentences at once"""
+        return default_segmenter.tokenize_batch(sentences)
     
     def morphological_segment(self, word: str) -> List[str]:
         """Basic morphological segmentation for Xhosa words"""
-        segments = []
-        
-        # Common Xhosa prefixes
-        prefixes = ['umu', 'aba', 'imi', 'ama', 'isi', 'izi', 'ubu', 'uku', 'ili']
-        for prefix in prefixes:
-            if word.startswith(prefix) and len(word) > len(prefix) + 2:
-                segments.append(prefix)
-                word = word[len(prefix):]
-                break
-        
-        # Common Xhosa suffixes
-        suffixes = ['eni', 'ini', 'oni', 'weni', 'yeni', 'kazi', 'ana']
-        for suffix in suffixes:
-            if word.endswith(suffix) and len(word) > len(suffix) + 2:
-                segments.append(word[:-len(suffix)])
-                segments.append(suffix)
-                return segments
-                
-        segments.append(word)
-        return segments
+        return default_segmenter.segment(word)
     
     def train(self, sentences: List[str]):
         """Train the sentence-level N-gram model"""
+        self._ensure_mutable()
         for sentence in sentences:
-            # Split conversation pairs and process each part
-            if '|' in sentence:
-                parts = sentence.split('|')
-                for part in parts:
-                    self._train_sentence(part.strip())
+            self._train_line(sentence)
+        
+        self._invalidate_caches()
+    
+    def train_stream(self, source: CorpusSource):
+        """Train from a file path or any iterable of lines, one sentence or conversation pair per line"""
+        self._ensure_mutable()
+        for line in iter_lines(source):
+            if line.strip():
+                self._train_line(line)
+        
+        self._invalidate_caches()
+    
+    def _train_line(self, sentence: str):
+        """Train on one line, splitting conversation pairs"""
+        for part in self._line_sentences(sentence):
+            self._train_sentence(part)
+    
+    def _line_sentences(self, sentence: str) -> List[str]:
+        """Sentences of one line: each side of a conversation pair, or the line itself"""
+        # Split conversation pairs and process each part
+        if '|' in sentence:
+            return [part.strip() for part in sentence.split('|')]
+        return [sentence]
+    
+    def update(self, sentences: List[str]) -> Set[Tuple[str, ...]]:
+        """
+        Add new sentences (e.g. the latest conversation logs) without retraining
+        Only the caches that depend on the changed contexts are dropped;
+        returns the contexts whose counts changed
+        """
+        return self._apply_deltas(self._ngram_deltas(sentences), 1)
+    
+    def remove(self, sentences: List[str]) -> Set[Tuple[str, ...]]:
+        """
+        Subtract sentences the model was trained on
+        Raises ValueError, leaving the model unchanged, if any n-gram of them is not counted
+        """
+        deltas = self._ngram_deltas(sentences)
+        for (context, word), count in deltas.items():
+            available = self.ngram_counts[context].get(word, 0) if context in self.ngram_counts else 0
+            if available < count:
+                raise ValueError(f"Cannot remove {count} x {context + (word,)}: the model has {available}")
+        return self._apply_deltas(deltas, -1)
+    
+    def _ngram_deltas(self, sentences: List[str]) -> Counter:
+        """Count the (context, word) pairs of sentences exactly as train() would"""
+        deltas = Counter()
+        for line in sentences:
+            for sentence in self._line_sentences(line):
+                deltas.update(self._sentence_ngrams(sentence))
+        return deltas
+    
+    def _apply_deltas(self, deltas: Counter, sign: int) -> Set[Tuple[str, ...]]:
+        """Add (sign=1) or subtract (sign=-1) n-gram counts, keeping every derived count exact"""
+        thawed = self.is_compact
+        self._ensure_mutable()
+        
+        start_context = tuple(['<s>'] * (self.n - 1))
+        dirty = set()
+        vocab_changed = False
+        emptied = set()
+        for (context, word), count in deltas.items():
+            delta = sign * count
+            counts = self.ngram_counts[context]
+            remaining = counts[word] + delta
+            if word not in counts:
+                self.ngram_types += 1
+            if remaining > 0:
+                counts[word] = remaining
+                self.continuation_counts[context].add(word)
             else:
-                self._train_sentence(sentence)
+                del counts[word]
+                self.ngram_types -= 1
+                self.continuation_counts[context].discard(word)
+                emptied.add(word)
+            
+            self.context_counts[context] += delta
+            if not counts:
+                del self.ngram_counts[context]
+                self.context_counts.pop(context, None)
+                self.continuation_counts.pop(context, None)
+            
+            if context == start_context:
+                self.start_tokens[word] += delta
+                if self.start_tokens[word] <= 0:
+                    del self.start_tokens[word]
+            
+            if word not in self.vocab:
+                self.vocab.add(word)
+                vocab_changed = True
+            self.total_tokens += delta
+            dirty.add(context)
+        
+        # A word leaves the vocabulary only once no context has it as a continuation
+        for counts in self.ngram_counts.values():
+            if not emptied:
+                break
+            emptied = {word for word in emptied if word not in counts}
+        if emptied:
+            self.vocab -= emptied
+            vocab_changed = True
+        
+        if thawed or (vocab_changed and self.smoothing == 'laplace'):
+            self._invalidate_caches()
+        else:
+            self._refresh_caches(dirty, vocab_changed)
+        return dirty
     
-    def _train_sentence(self, sentence: str):
-        """Train on a single sentence"""
+    def _refresh_caches(self, dirty: Set[Tuple[str, ...]], vocab_changed: bool):
+        """
+        Drop only what depends on the changed contexts
+        A probability depends on every context in its backoff chain, so a cached
+        entry is stale when any suffix of its context changed
+        """
+        def stale(context: Tuple[str, ...]) -> bool:
+            return any(context[i:] in dirty for i in range(len(context) + 1))
+        
+        self._probability_cache.discard_if(lambda key: stale(key[0]))
+        self._normalizer_cache.discard_if(stale)
+        self._stats_cache.clear()
+        if vocab_changed:
+            # Engine arrays are indexed by word ID, so a new vocabulary needs a new engine
+            self._engine = None
+        elif self._engine is not None:
+            self._engine.refresh(self, dirty)
+    
+    def merge(self, other: 'SentenceNGram'):
+        """Add the counts of another model of the same order (e.g. one trained on a corpus shard)"""
+        if other.n != self.n:
+            raise ValueError(f"Cannot merge a {other.n}-gram model into a {self.n}-gram model")
+        
+        self._ensure_mutable()
+        for context, counts in other.ngram_counts.items():
+            row = self.ngram_counts[context]
+            before = len(row)
+            row.update(counts)
+            self.ngram_types += len(row) - before
+        for context, count in other.context_counts.items():
+            self.context_counts[context] += count
+        for context, words in other.continuation_counts.items():
+            self.continuation_counts[context].update(words)
+        self.vocab.update(other.vocab)
+        self.total_tokens += other.total_tokens
+        self.start_tokens.update(other.start_tokens)
+        
+        self._invalidate_caches()
+    
+    @property
+    def is_compact(self) -> bool:
+        """Whether the counts are frozen in compact array storage"""
+        return isinstance(self.ngram_counts, NGramCountsView)
+    
+    def compact(self) -> CompactNGramCounts:
+        """
+        Freeze the counts into compact array storage
+        ngram_counts, context_counts and continuation_counts become read-only
+        views over one CompactNGramCounts; training again thaws them
+        """
+        if self.is_compact:
+            return self.ngram_counts.store
+        
+        store = CompactNGramCounts(self.ngram_counts)
+        self.ngram_counts = store.ngram_view()
+        self.context_counts = store.context_totals_view()
+        self.continuation_counts = self.ngram_counts
+        # Top-k ties follow storage order, which compaction changes
+        self._stats_cache.clear()
+        return store
+    
+    def _ensure_mutable(self):
+        """Expand compact storage back into dictionaries before the counts change"""
+        if self.is_compact:
+            self.ngram_counts, self.context_counts, self.continuation_counts = self.ngram_counts.store.to_dicts()
+    
+    def _invalidate_caches(self):
+        """Counts changed, so the engine arrays and memoized probabilities are stale"""
+        self._engine = None
+        self._stats_cache.clear()
+        self._probability_cache.clear()
+        self._normalizer_cache.clear()
+    
+    def cache_info(self) -> Dict:
+        """Get hit/miss statistics for the probability and normalizer caches"""
+        info = {
+            'probability': self._probability_cache.stats(),
+            'normalizer': self._normalizer_cache.stats()
+        }
+        if self._engine is not None:
+            info['distribution'] = self._engine.distribution_cache.stats()
+            info['decoding'] = self._engine.decoding_cache.stats()
+        return info
+    
+    def _sentence_ngrams(self, sentence: str) -> Iterator[Tuple[Tuple[str, ...], str]]:
+        """(context, word) pairs of a single sentence; sentences shorter than n tokens have none"""
         tokens = self.preprocess_xhosa_sentence(sentence)
         if len(tokens) < self.n:
             return
@@ -88,10 +273,15 @@ class SentenceNGram:
         
         for i in range(len(padded_tokens) - self.n + 1):
             ngram = tuple(padded_tokens[i:i + self.n])
-            context = ngram[:-1]
-            word = ngram[-1]
-            
-            self.ngram_counts[context][word] += 1
+            yield ngram[:-1], ngram[-1]
+    
+    def _train_sentence(self, sentence: str):
+        """Train on a single sentence"""
+        for context, word in self._sentence_ngrams(sentence):
+            counts = self.ngram_counts[context]
+            if word not in counts:
+                self.ngram_types += 1
+            counts[word] += 1
             self.context_counts[context] += 1
             self.vocab.add(word)
             self.continuation_counts[context].add(word)
@@ -99,10 +289,12 @@ class SentenceNGram:
             
             # Track sentence starters
             if context == tuple(['<s>'] * (self.n - 1)):
-                self.start_tokens.append(word)
+                self.start_tokens[word] += 1
     
     def probability(self, context: Tuple[str, ...], word: str) -> float:
         """Calculate probability with advanced smoothing"""
+        if self.vectorized:
+            return self.engine.probability(context, word)
         if self.smoothing == 'kneser_ney':
             return self._kneser_ney_probability(context, word)
         elif self.smoothing == 'laplace':
@@ -111,21 +303,40 @@ class SentenceNGram:
             return self._mle_probability(context, word)
     
     def _kneser_ney_probability(self, context: Tuple[str, ...], word: str) -> float:
-        """Kneser-Ney smoothing for better handling of unseen n-grams"""
+        """
+        Kneser-Ney smoothing, memoized on (context, word)
+        Walks down the backoff chain to the first memoized level (or the
+        unigrams), then computes and caches each level on the way back up
+        """
+        chain = []
+        while True:
+            prob = self._probability_cache.get((context, word))
+            if prob is not None:
+                break
+            chain.append(context)
+            if not context:
+                break
+            context = context[1:]
+        
+        for level in reversed(chain):
+            prob = self._kneser_ney_level(level, word, prob)
+            self._probability_cache.put((level, word), prob)
+        if chain and metrics.enabled:
+            metrics.observe('thetha_backoff_depth', len(chain), model='sentence')
+        return prob
+    
+    def _kneser_ney_level(self, context: Tuple[str, ...], word: str, lower_order_prob: Optional[float]) -> float:
+        """Kneser-Ney smoothing at one context given the probability of its lower order"""
         if not context:
             # Unigram probability
-            return self.ngram_counts[()].get(word, 0) / max(1, sum(self.ngram_counts[()].values()))
+            unigram_total, _ = self._normalizer(())
+            return self.ngram_counts[()].get(word, 0) / unigram_total
         
         discount = 0.75  # Typical discount value
         
         # Higher order probability
         higher_order = max(self.ngram_counts[context].get(word, 0) - discount, 0)
-        higher_order_denom = self.context_counts.get(context, 0)
-        
-        # Lower order continuation probability
-        continuation_count = len(self.continuation_counts[context])
-        lower_order_context = context[1:] if len(context) > 1 else ()
-        lower_order_prob = self._kneser_ney_probability(lower_order_context, word)
+        higher_order_denom, continuation_count = self._normalizer(context)
         
         if higher_order_denom == 0:
             return lower_order_prob
@@ -134,6 +345,17 @@ class SentenceNGram:
         
         return (higher_order / higher_order_denom) + (lambda_factor * lower_order_prob)
     
+    def _normalizer(self, context: Tuple[str, ...]) -> Tuple[int, int]:
+        """Get (denominator, continuation count) for a context; the empty context sums its unigrams"""
+        normalizer = self._normalizer_cache.get(context)
+        if normalizer is None:
+            if not context:
+                normalizer = (max(1, sum(self.ngram_counts[()].values())), 0)
+            else:
+                normalizer = (self.context_counts.get(context, 0), len(self.continuation_counts[context]))
+            self._normalizer_cache.put(context, normalizer)
+        return normalizer
+    
     def _laplace_probability(self, context: Tuple[str, ...], word: str) -> float:
         """Laplace (Add-One) smoothing"""
         numerator = self.ngram_counts[context].get(word, 0) + 1
@@ -146,8 +368,18 @@ class SentenceNGram:
             return 0
         return self.ngram_counts[context].get(word, 0) / self.context_counts[context]
     
-    def generate_sentence(self, max_length: int = 20, start_context: List[str] = None) -> str:
-        """Generate a complete Xhosa sentence"""
+    def generate_sentence(self, max_length: int = 20, start_context: List[str] = None,
+                          temperature: float = 1.0, top_k: Optional[int] = None,
+                          top_p: Optional[float] = None, rng=None) -> str:
+        """
+        Generate a complete Xhosa sentence
+        temperature / top_k / top_p decode through the engine's per-context
+        candidate tables; the defaults keep plain sampling
+        rng is a random.Random or numpy Generator to draw from (default: the
+        engine's generator, or the random module when not vectorized)
+        """
+        start = time.perf_counter() if metrics.enabled else None
+        decoding = make_decoding(temperature, top_k, top_p)
         if start_context:
             context = tuple(['<s>'] * (self.n - 1 - len(start_context)) + start_context)
         else:
@@ -155,6 +387,18 @@ class SentenceNGram:
         
         generated = []
         
+        if self.vectorized or decoding is not None:
+            for _ in range(max_length):
+                word = self.engine.sample(context, decoding, rng)
+                if word is None or word == '</s>':
+                    break
+                generated.append(word)
+                context = context[1:] + (word,)
+            
+            if start is not None:
+                record_generation('sentence', 'generate_sentence', start)
+            return self._post_process_sentence(' '.join(generated))
+        
         for _ in range(max_length):
             # Get possible next words with probabilities
             candidates = []
@@ -165,12 +409,14 @@ class SentenceNGram:
                 if prob > 0:
                     candidates.append((word, prob))
                     total_prob += prob
+            if start is not None:
+                metrics.observe('thetha_candidate_scan_size', len(self.vocab), model='sentence')
             
             if not candidates:
                 break
                 
             # Normalize probabilities and select
-            rand_val = random.uniform(0, total_prob)
+            rand_val = (rng or random).uniform(0, total_prob)
             cumulative = 0
             
             for word, prob in candidates:
@@ -188,9 +434,37 @@ class SentenceNGram:
                 break
         
         # Post-process generated sentence
+        if start is not None:
+            record_generation('sentence', 'generate_sentence', start)
         sentence = ' '.join(generated)
         return self._post_process_sentence(sentence)
     
+    def beam_search(self, beam_width: int = 5, n_best: int = 5, max_length: int = 20,
+                    start_context: List[str] = None, min_prob: float = 0.0,
+                    beam_threshold: Optional[float] = None) -> List[Dict]:
+        """
+        n-best sentences by beam search, most probable first
+        Each result has the post-processed sentence, its tokens, the total log2
+        probability (including </s> when finished) and whether it finished
+        before max_length; see beam_search.beam_search for the pruning options
+        """
+        if start_context:
+            context = tuple(['<s>'] * (self.n - 1 - len(start_context)) + start_context)
+        else:
+            context = tuple(['<s>'] * (self.n - 1))
+        
+        results = beam_search(self.engine, context, beam_width=beam_width, n_best=n_best,
+                              max_length=max_length, min_prob=min_prob, beam_threshold=beam_threshold)
+        return [
+            {
+                'sentence': self._post_process_sentence(' '.join(tokens)),
+                'tokens': tokens,
+                'log2_prob': log2_prob,
+                'finished': finished
+            }
+            for tokens, log2_prob, finished in results
+        ]
+    
     def _post_process_sentence(self, sentence: str) -> str:
         """Apply Xhosa-specific post-processing"""
         # Capitalize first letter
@@ -233,21 +507,55 @@ class SentenceNGram:
         avg_log_prob = total_log_prob / total_words
         return 2 ** (-avg_log_prob)
     
-    def get_model_stats(self) -> Dict:
-        """Get comprehensive model statistics"""
-        return {
+    def score_batch(self, test_sentences: List[str]) -> Dict:
+        """
+        Score many sentences at once
+        Returns per-token log2 probabilities (-inf for zero-probability tokens
+        instead of silently skipping them), per-sentence offsets into that
+        array, aggregate perplexity and OOV / zero-probability counts.
+        Sentences shorter than n tokens are skipped, as in perplexity()
+        """
+        items = []
+        skipped = 0
+        for sentence in test_sentences:
+            tokens = self.preprocess_xhosa_sentence(sentence)
+            if len(tokens) < self.n:
+                skipped += 1
+                items.append([])
+                continue
+                
+            padded_tokens = ['<s>'] * (self.n - 1) + tokens + ['</s>']
+            items.append([(tuple(padded_tokens[i - self.n + 1:i]), padded_tokens[i])
+                          for i in range(self.n - 1, len(padded_tokens))])
+        return score_token_batch(self.engine, items, skipped_items=skipped)
+    
+    def get_model_stats(self, k: int = 10, histograms: bool = False) -> Dict:
+        """
+        Get comprehensive model statistics
+        Counters are maintained during training and the top-k list is cached
+        until the counts change, so repeated calls are O(1)
+        :param histograms: also include count-of-counts and context fan-out histograms
+        """
+        stats = {
             'vocab_size': len(self.vocab),
-            'total_ngrams': sum(len(counts) for counts in self.ngram_counts.values()),
+            'total_ngrams': self.ngram_types,
             'unique_contexts': len(self.ngram_counts),
             'total_tokens': self.total_tokens,
-            'most_common_ngrams': self._get_most_common_ngrams(10)
+            'most_common_ngrams': self._get_most_common_ngrams(k)
         }
+        if histograms:
+            stats.update(self.count_histograms())
+        return stats
     
     def _get_most_common_ngrams(self, k: int) -> List[Tuple]:
         """Get k most common n-grams"""
-        all_ngrams = []
-        for context, counts in self.ngram_counts.items():
-            for word, count in counts.most_common():
-                all_ngrams.append((context + (word,), count))
-        
-        return sorted(all_ngrams, key=lambda x: x[1], reverse=True)[:k]
\ No newline at end of file
+        key = ('most_common', k)
+        if key not in self._stats_cache:
+            self._stats_cache[key] = top_ngrams(self.ngram_counts, k, lambda context, word: context + (word,))
+        return self._stats_cache[key]
+    
+    def count_histograms(self) -> Dict[str, Dict[int, int]]:
+        """Count-of-counts and context fan-out histograms, cached until the counts change"""
+        if 'histograms' not in self._stats_cache:
+            self._stats_cache['histograms'] = count_histograms(self.ngram_counts)
+        return self._stats_cache['histograms']
\ No newline at end of file
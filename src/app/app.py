@@ -1,16 +1,27 @@
 import streamlit as st
-import pickle
+import sys
 from pathlib import Path
-import random
+
+# Make the project root importable when run as `streamlit run src/app/app.py`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.model.binary_format import load_model_bundle
+from src.model.batch_generate import generate_responses
+from src.model.response_index import ResponseIndex
 
 MODEL_PATH = Path("src/model/ngram_model.pkl")
+# Memory-mapped model written by `python -m src.model.binary_format`; preferred when present
+BINARY_MODEL_PATH = Path("src/model/ngram_model.bin")
 
-# Load trained model
-with open(MODEL_PATH, "rb") as f:
-    data = pickle.load(f)
+@st.cache_resource(show_spinner=False)
+def load_model():
+    """Load the model once per process; the binary format is mapped, not deserialized"""
+    input_to_response, ngram_model = load_model_bundle(BINARY_MODEL_PATH if BINARY_MODEL_PATH.exists() else MODEL_PATH)
+    # Normalized/nearest-match lookup, so punctuation or a typo does not force a generated reply
+    return ResponseIndex(input_to_response), ngram_model
 
-input_to_response = data["input_to_response"]
-ngram_model = data["ngram_model"]
+# Load trained model
+input_to_response, ngram_model = load_model()
 
 st.set_page_config(
     page_title="🗣️ ThethaAI – isiXhosa Conversational Demo",
@@ -23,18 +34,10 @@ st.write("Enter multiple isiXhosa sentences or phrases (one per line) and get re
 
 user_input = st.text_area("👉 Enter text:", height=150)
 num_words = st.slider("Length of generated response (words)", min_value=5, max_value=50, value=20)
-
-def generate_text(model, n=2, max_words=20):
-    start = ("~",) * (n - 1)
-    result = list(start)
-    for _ in range(max_words):
-        key = tuple(result[-(n - 1):])
-        possible = model.get(key, ["~"])
-        next_word = random.choice(possible)
-        if next_word == "~":
-            break
-        result.append(next_word)
-    return " ".join(result[(n - 1):])
+with st.expander("Decoding"):
+    temperature = st.slider("Temperature", min_value=0.0, max_value=2.0, value=1.0, step=0.1)
+    top_k = st.number_input("Top-k (0 = off)", min_value=0, max_value=1000, value=0)
+    top_p = st.slider("Top-p", min_value=0.05, max_value=1.0, value=1.0, step=0.05)
 
 if st.button("Generate Responses"):
     inputs = [line.strip() for line in user_input.split("\n") if line.strip()]
@@ -42,12 +45,11 @@ if st.button("Generate Responses"):
         st.warning("Please enter at least one line of text.")
     else:
         st.subheader("🤖 ThethaAI Responses:")
-        for i, text in enumerate(inputs, 1):
-            key = text.lower()
-            if key in input_to_response:
-                response = input_to_response[key]
-            else:
-                response = generate_text(ngram_model, n=2, max_words=num_words)
+        responses = generate_responses(
+            inputs, input_to_response, ngram_model, n=2, max_words=num_words, workers=1,
+            temperature=temperature, top_k=int(top_k) or None, top_p=top_p
+        )
+        for i, (text, response) in enumerate(zip(inputs, responses), 1):
             st.markdown(f"**Input {i}:** {text}")
             st.markdown(f"**Response {i}:** {response}")
             st.write("---")
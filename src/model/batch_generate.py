@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .ngram import generate_text
+from .response_index import ResponseIndex
+
+# Model state of a worker process, set once by the pool initializer
+_worker_model = None
+_worker_n = 2
+
+def normalize_prompt(text):
+    """Lookup key of a prompt, as used by the app (case-insensitive, trimmed)"""
+    return text.strip().lower()
+
+def request_seed(seed, key):
+    """
+    Per-request seed derived from the batch seed and the prompt, so a prompt's
+    response does not depend on which other prompts share its batch.
+    """
+    digest = hashlib.sha256(f"{seed}\0{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+def _init_worker(ngram_model, n):
+    global _worker_model, _worker_n
+    _worker_model = ngram_model
+    _worker_n = n
+
+def _generate_chunk(args):
+    """Worker: generate one chunk of (seed) requests with the process-local model"""
+    seeds, max_words, decoding = args
+    return [
+        generate_text(_worker_model, n=_worker_n, max_words=max_words, rng=random.Random(s), **decoding)
+        for s in seeds
+    ]
+
+class BatchGenerator:
+    """
+    Batch response generation over a loaded model.
+    Prompts are deduplicated, matches are served from the lookup table
+    (a ResponseIndex also matches normalized and misspelled prompts),
+    and the rest are generated over a process pool that receives the model
+    once per worker (binary models are re-mapped by path, not copied).
+    """
+    def __init__(self, input_to_response, ngram_model, n=2, workers=None, chunk_size=256):
+        self.input_to_response = input_to_response
+        self.ngram_model = ngram_model
+        self.n = n
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = None
+        # serve() calls generate() from one thread per request, so the pool is created under a lock
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self.ngram_model, self.n)
+                )
+            return self._executor
+
+    def lookup(self, key):
+        """Stored response for a normalized prompt, or None"""
+        return self.input_to_response.get(key)
+
+    def generate(self, prompts, max_words=20, seed=None, temperature=1.0, top_k=None, top_p=None):
+        """
+        Respond to many prompts, in input order.
+        :param prompts: list of prompt strings
+        :param max_words: maximum words per generated response
+        :param seed: batch seed; the same seed and prompt always give the same response
+        :param temperature, top_k, top_p: decoding controls for generated responses (see generate_text)
+        """
+        decoding = {"temperature": temperature, "top_k": top_k, "top_p": top_p}
+        if seed is None:
+            seed = random.getrandbits(64)
+
+        keys = [normalize_prompt(p) for p in prompts]
+        responses = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            response = self.lookup(key)
+            if response is None:
+                pending.append(key)
+            else:
+                responses[key] = response
+
+        seeds = [request_seed(seed, key) for key in pending]
+        if self.workers == 1 or len(pending) <= self.chunk_size:
+            generated = [
+                generate_text(self.ngram_model, n=self.n, max_words=max_words, rng=random.Random(s), **decoding)
+                for s in seeds
+            ]
+        else:
+            chunks = [
+                (seeds[i:i + self.chunk_size], max_words, decoding) for i in range(0, len(seeds), self.chunk_size)
+            ]
+            generated = [text for chunk in self._pool().map(_generate_chunk, chunks) for text in chunk]
+
+        responses.update(zip(pending, generated))
+        return [responses[key] for key in keys]
+
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def generate_responses(prompts, input_to_response, ngram_model, n=2, max_words=20, seed=None, workers=None,
+                       **decoding):
+    """
+    One-shot batch generation; see BatchGenerator.
+    :param decoding: temperature / top_k / top_p for generated responses
+    :return: list of responses aligned with prompts
+    """
+    with BatchGenerator(input_to_response, ngram_model, n=n, workers=workers) as generator:
+        return generator.generate(prompts, max_words=max_words, seed=seed, **decoding)
+
+def make_handler(generator):
+    """HTTP handler class serving POST /generate for a BatchGenerator"""
+    class GenerateHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/generate":
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                prompts = body["prompts"]
+                if not isinstance(prompts, list) or not all(isinstance(p, str) for p in prompts):
+                    raise ValueError("prompts must be a list of strings")
+                responses = generator.generate(
+                    prompts, max_words=int(body.get("max_words", 20)), seed=body.get("seed"),
+                    temperature=float(body.get("temperature", 1.0)), top_k=body.get("top_k"), top_p=body.get("top_p")
+                )
+            except (KeyError, ValueError, TypeError) as e:
+                self.send_error(400, str(e))
+                return
+            payload = json.dumps({"responses": responses}, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GenerateHandler
+
+def serve(generator, host="127.0.0.1", port=8765):
+    """Serve POST /generate {"prompts": [...], "max_words": 20, "seed": 1} on a local port"""
+    server = ThreadingHTTPServer((host, port), make_handler(generator))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    from .binary_format import load_model_bundle
+
+    parser = argparse.ArgumentParser(description="Batch-generate isiXhosa responses")
+    parser.add_argument("--model", default="src/model/ngram_model.pkl", help="model pickle or binary file")
+    parser.add_argument("--input", help="file with one prompt per line (default: stdin)")
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    parser.add_argument("--max-words", type=int, default=20)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--temperature", type=float, default=1.0)
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--top-p", type=float)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--exact", action="store_true", help="disable normalized/nearest-match lookup")
+    parser.add_argument("--serve", action="store_true", help="run the local HTTP endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    input_to_response, ngram_model = load_model_bundle(args.model)
+    if not args.exact:
+        input_to_response = ResponseIndex(input_to_response)
+    with BatchGenerator(input_to_response, ngram_model, workers=args.workers) as generator:
+        if args.serve:
+            serve(generator, args.host, args.port)
+        else:
+            if args.input:
+                with open(args.input, encoding="utf-8") as f:
+                    prompts = [line.strip() for line in f if line.strip()]
+            else:
+                prompts = [line.strip() for line in sys.stdin if line.strip()]
+            responses = generator.generate(
+                prompts, max_words=args.max_words, seed=args.seed,
+                temperature=args.temperature, top_k=args.top_k, top_p=args.top_p
+            )
+            lines = (json.dumps({"prompt": prompt, "response": response}, ensure_ascii=False)
+                     for prompt, response in zip(prompts, responses))
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as out:
+                    for line in lines:
+                        print(line, file=out)
+            else:
+                for line in lines:
+                    print(line)
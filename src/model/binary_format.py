@@ -0,0 +1,294 @@
+import json
+import mmap
+import pickle
+import random
+import struct
+import argparse
+import numpy as np
+from .ngram import convert_list_model
+from .sampling import candidate_table
+
+# File layout (all little-endian, every section 8-byte aligned):
+#   magic (4 bytes) | version (uint32) | header length (uint32) | JSON header | sections
+# The JSON header records n, the vocabulary size and the offset/dtype/length of
+# each section, so a reader only maps the file and wraps sections with numpy.
+MAGIC = b"THNG"
+VERSION = 1
+_PREAMBLE = struct.Struct("<4sII")
+_ALIGN = 8
+
+class StringTable:
+    """
+    Sorted UTF-8 strings stored as an offsets array plus one byte blob.
+    Lookups decode only the strings they touch.
+    """
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def __getitem__(self, i):
+        return self.raw(i).decode("utf-8")
+
+    def find(self, text):
+        """Index of text in the table, or -1"""
+        encoded = text.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.raw(lo) == encoded:
+            return lo
+        return -1
+
+class BinaryNGramModel:
+    """
+    Weighted word n-gram model read straight from a memory-mapped file.
+    Contexts are packed into one uint64 per key (mixed radix over word IDs)
+    and found by binary search; next words are drawn by bisecting the
+    per-context cumulative weights.
+    """
+    def __init__(self, n, vocab, context_keys, context_offsets, next_ids, cum_weights, path=None):
+        self.path = path
+        self.n = n
+        self.vocab = vocab
+        self.context_keys = context_keys
+        self.context_offsets = context_offsets
+        self.next_ids = next_ids
+        self.cum_weights = cum_weights
+
+    def __len__(self):
+        return len(self.context_keys)
+
+    def __reduce__(self):
+        # Pickle by path, so worker processes map the same file instead of copying it
+        return _reopen_ngram_model, (self.path,)
+
+    def _context_index(self, key):
+        packed = 0
+        base = len(self.vocab)
+        for word in key:
+            word_id = self.vocab.find(word)
+            if word_id < 0:
+                return -1
+            packed = packed * base + word_id
+        index = int(np.searchsorted(self.context_keys, np.uint64(packed)))
+        if index < len(self.context_keys) and int(self.context_keys[index]) == packed:
+            return index
+        return -1
+
+    def get(self, key, default=None):
+        """Decode one entry as (distinct next words, cumulative weights)"""
+        index = self._context_index(key)
+        if index < 0:
+            return default
+        start, end = int(self.context_offsets[index]), int(self.context_offsets[index + 1])
+        words = tuple(self.vocab[int(i)] for i in self.next_ids[start:end])
+        return words, tuple(int(w) for w in self.cum_weights[start:end])
+
+    def __contains__(self, key):
+        return self._context_index(key) >= 0
+
+    def sample_next_word(self, key, rng=None):
+        """Sample the word following a key; "~" (end) when the key is unseen"""
+        index = self._context_index(key)
+        if index < 0:
+            return "~"
+        start, end = int(self.context_offsets[index]), int(self.context_offsets[index + 1])
+        total = int(self.cum_weights[end - 1])
+        target = (rng or random).random() * total
+        position = start + int(np.searchsorted(self.cum_weights[start:end], target, side="right"))
+        return self.vocab[int(self.next_ids[min(position, end - 1)])]
+
+    def decoding_table(self, key, decoding):
+        """Candidate next words of a key under a sampling.Decoding, or None when unseen"""
+        index = self._context_index(key)
+        if index < 0:
+            return None
+        start, end = int(self.context_offsets[index]), int(self.context_offsets[index + 1])
+        weights = np.diff(self.cum_weights[start:end], prepend=0)
+        indices, cumulative = candidate_table(weights, decoding)
+        return [self.vocab[int(self.next_ids[start + i])] for i in indices], cumulative
+
+class ResponseTable:
+    """Read-only input -> response mapping over two aligned string tables"""
+    def __init__(self, inputs, responses, path=None):
+        self.path = path
+        self.inputs = inputs
+        self.responses = responses
+
+    def __reduce__(self):
+        # Pickle by path, like BinaryNGramModel
+        return _reopen_response_table, (self.path,)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __contains__(self, key):
+        return self.inputs.find(key) >= 0
+
+    def __getitem__(self, key):
+        index = self.inputs.find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self.responses[index]
+
+    def get(self, key, default=None):
+        index = self.inputs.find(key)
+        return default if index < 0 else self.responses[index]
+
+    def items(self):
+        for i in range(len(self.inputs)):
+            yield self.inputs[i], self.responses[i]
+
+def _reopen_ngram_model(path):
+    return BinaryModelBundle(path).ngram_model
+
+def _reopen_response_table(path):
+    return BinaryModelBundle(path).input_to_response
+
+class BinaryModelBundle:
+    """An opened model file: the n-gram model and the input/response table share one mapping"""
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ThethaAI binary model")
+        if version != VERSION:
+            raise ValueError(f"Unsupported model format version {version} (expected {VERSION})")
+        header = json.loads(bytes(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+
+        sections = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(spec["dtype"]), count=spec["count"], offset=spec["offset"])
+            for name, spec in header["sections"].items()
+        }
+        vocab = StringTable(sections["vocab_offsets"], sections["vocab_blob"])
+        self.n = header["n"]
+        self.ngram_model = BinaryNGramModel(
+            self.n, vocab, sections["context_keys"], sections["context_offsets"],
+            sections["next_ids"], sections["cum_weights"], path=self.path
+        )
+        self.input_to_response = ResponseTable(
+            StringTable(sections["input_offsets"], sections["input_blob"]),
+            StringTable(sections["response_offsets"], sections["response_blob"]),
+            path=self.path
+        )
+
+def _string_sections(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(e) for e in encoded]) if encoded else []
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def save_binary_model(path, ngram_model, input_to_response=None):
+    """
+    Write an n-gram model (weighted or legacy list format) and an optional
+    input -> response dict in the memory-mappable binary format.
+    """
+    ngram_model = convert_list_model(ngram_model)
+    input_to_response = input_to_response or {}
+    n = len(next(iter(ngram_model))) + 1 if ngram_model else 2
+
+    words = {word for key in ngram_model for word in key}
+    for next_words, _ in ngram_model.values():
+        words.update(next_words)
+    vocab = sorted(words, key=lambda w: w.encode("utf-8"))
+    word_to_id = {word: i for i, word in enumerate(vocab)}
+    base = max(1, len(vocab))
+    if base ** (n - 1) >= 2 ** 64:
+        raise ValueError(f"A {n}-gram model over {len(vocab)} words does not fit 64-bit context keys")
+
+    rows = []
+    for key, (next_words, cum_weights) in ngram_model.items():
+        packed = 0
+        for word in key:
+            packed = packed * base + word_to_id[word]
+        rows.append((packed, next_words, cum_weights))
+    rows.sort(key=lambda row: row[0])
+
+    context_offsets = np.zeros(len(rows) + 1, dtype="<u8")
+    context_offsets[1:] = np.cumsum([len(row[1]) for row in rows]) if rows else []
+    next_ids = np.array([word_to_id[w] for row in rows for w in row[1]], dtype="<u4")
+    cum_weights = np.array([c for row in rows for c in row[2]], dtype="<u8")
+
+    pairs = sorted(input_to_response.items(), key=lambda kv: kv[0].encode("utf-8"))
+    vocab_offsets, vocab_blob = _string_sections(vocab)
+    input_offsets, input_blob = _string_sections(k for k, _ in pairs)
+    response_offsets, response_blob = _string_sections(v for _, v in pairs)
+
+    arrays = {
+        "vocab_offsets": vocab_offsets,
+        "vocab_blob": vocab_blob,
+        "context_keys": np.array([row[0] for row in rows], dtype="<u8"),
+        "context_offsets": context_offsets,
+        "next_ids": next_ids,
+        "cum_weights": cum_weights,
+        "input_offsets": input_offsets,
+        "input_blob": input_blob,
+        "response_offsets": response_offsets,
+        "response_blob": response_blob,
+    }
+
+    # The header holds absolute offsets, so size it first and lay sections out after it
+    def layout(header_len):
+        position = _PREAMBLE.size + header_len
+        sections = {}
+        for name, array in arrays.items():
+            position += -position % _ALIGN
+            sections[name] = {"offset": position, "dtype": array.dtype.str, "count": len(array)}
+            position += array.nbytes
+        return json.dumps({"n": n, "vocab_size": len(vocab), "sections": sections}).encode("utf-8")
+
+    header = layout(0)
+    while len(layout(len(header))) != len(header):
+        header = layout(len(header))
+    header = layout(len(header))
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (-f.tell() % _ALIGN))
+            f.write(array.tobytes())
+
+def load_binary_model(path):
+    """Open a binary model file without deserializing it"""
+    return BinaryModelBundle(path)
+
+def load_model_bundle(path):
+    """
+    Load (input_to_response, ngram_model) from either format: binary files are
+    memory-mapped, pickles are deserialized and upgraded to the weighted format.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        bundle = load_binary_model(path)
+        return bundle.input_to_response, bundle.ngram_model
+
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    return data["input_to_response"], convert_list_model(data["ngram_model"])
+
+def convert_pickle(src_path, dst_path):
+    """Convert a pickled model bundle ({"ngram_model", "input_to_response"}) to the binary format"""
+    with open(src_path, "rb") as f:
+        data = pickle.load(f)
+    save_binary_model(dst_path, data["ngram_model"], data.get("input_to_response"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pickled model bundle to the memory-mapped binary format")
+    parser.add_argument("src", help="existing model pickle")
+    parser.add_argument("dst", help="where to write the binary model")
+    args = parser.parse_args()
+    convert_pickle(args.src, args.dst)
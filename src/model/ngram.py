@@ -1,14 +1,20 @@
+import os
+import pickle
 import random
-from collections import defaultdict
+import argparse
+from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from .sampling import candidate_table, draw, make_decoding
 
-def build_ngram_model(conversations, n=2):
+def count_ngrams(conversations, n=2):
     """
-    Builds a word-level n-gram model from input-response pairs.
+    Counts word-level n-grams from input-response pairs.
     :param conversations: list of (input_line, response_line) tuples
     :param n: n-gram size (number of words)
-    :return: dict mapping (n-1)-grams -> possible next words
+    :return: dict mapping (n-1)-grams -> Counter of next words (in first-seen order)
     """
-    model = defaultdict(list)
+    counts = defaultdict(Counter)
     
     for _, response in conversations:
         words = response.strip().split()
@@ -18,31 +24,179 @@ def build_ngram_model(conversations, n=2):
         for i in range(len(padded) - n + 1):
             key = tuple(padded[i:i + n - 1])
             next_word = padded[i + n - 1]
-            model[key].append(next_word)
+            counts[key][next_word] += 1
+    
+    return dict(counts)
+
+def to_weighted(next_word_counts):
+    """
+    Freezes a Counter of next words into the weighted model format.
+    :param next_word_counts: Counter (or dict) mapping next word -> count
+    :return: (distinct next words, cumulative weights) tuple pair
+    """
+    words = tuple(next_word_counts)
+    cum_weights = tuple(accumulate(next_word_counts[word] for word in words))
+    return words, cum_weights
+
+def to_counts(entry):
+    """
+    Expands one model entry (weighted pair or legacy list) back into a Counter.
+    """
+    if isinstance(entry, list):
+        return Counter(entry)
+    words, cum_weights = entry
+    weights = [cum_weights[0]] + [b - a for a, b in zip(cum_weights, cum_weights[1:])]
+    return Counter(dict(zip(words, weights)))
+
+def build_ngram_model(conversations, n=2):
+    """
+    Builds a word-level n-gram model from input-response pairs.
+    :param conversations: list of (input_line, response_line) tuples
+    :param n: n-gram size (number of words)
+    :return: dict mapping (n-1)-grams -> (distinct next words, cumulative weights)
+    """
+    return {key: to_weighted(counts) for key, counts in count_ngrams(conversations, n=n).items()}
+
+def convert_list_model(model):
+    """
+    Converts a legacy list-based model (key -> every next word occurrence) into
+    the weighted format. Sampling the result gives the same distribution as
+    random.choice over the lists; entries already weighted are kept as-is.
+    """
+    return {
+        key: to_weighted(Counter(entry)) if isinstance(entry, list) else entry
+        for key, entry in model.items()
+    }
+
+def convert_model_file(src_path, dst_path):
+    """
+    Rewrites a pickled model bundle (with "ngram_model" and "input_to_response")
+    so its n-gram model uses the weighted format.
+    """
+    with open(src_path, "rb") as f:
+        data = pickle.load(f)
+    data["ngram_model"] = convert_list_model(data["ngram_model"])
+    with open(dst_path, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return data
+
+def _build_shard(args):
+    """Worker: count the n-grams of one shard of conversations"""
+    conversations, n = args
+    return count_ngrams(conversations, n=n)
+
+def merge_ngram_models(models):
+    """
+    Merge n-gram models built on consecutive shards of a corpus.
+    :param models: iterable of models (weighted, legacy list or Counter entries), in corpus order
+    :return: weighted dict identical to building the model on the whole corpus
+    """
+    merged = defaultdict(Counter)
+    for model in models:
+        for key, entry in model.items():
+            merged[key].update(entry if isinstance(entry, Counter) else to_counts(entry))
+    return {key: to_weighted(counts) for key, counts in merged.items()}
+
+def build_ngram_model_parallel(conversations, n=2, workers=None, shard_size=10000):
+    """
+    Builds the same model as build_ngram_model, counting shards in a process pool.
+    :param conversations: list of (input_line, response_line) tuples
+    :param n: n-gram size (number of words)
+    :param workers: number of processes (defaults to the CPU count)
+    :param shard_size: conversations per shard
+    :return: dict mapping (n-1)-grams -> (distinct next words, cumulative weights)
+    """
+    conversations = list(conversations)
+    workers = workers or os.cpu_count() or 1
+    shards = [(conversations[i:i + shard_size], n) for i in range(0, len(conversations), shard_size)]
+    if len(shards) <= 1:
+        return build_ngram_model(conversations, n=n)
     
-    return dict(model)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return merge_ngram_models(executor.map(_build_shard, shards))
+
+def decoding_table(model, key, decoding):
+    """
+    Candidate next words of a key under a Decoding, most probable first,
+    with their cumulative probabilities; None when the key is unseen.
+    """
+    compile_table = getattr(model, "decoding_table", None)
+    if compile_table is not None:
+        return compile_table(key, decoding)
+    entry = model.get(key)
+    if entry is None:
+        return None
+    counts = to_counts(entry)
+    words = list(counts)
+    indices, cumulative = candidate_table(list(counts.values()), decoding)
+    return [words[i] for i in indices], cumulative
+
+def sample_next_word(model, key, rng=None, decoding=None):
+    """
+    Sample the word following a key; "~" (end) when the key is unseen.
+    Accepts both weighted entries and legacy lists, or any model object
+    with its own sample_next_word (e.g. a memory-mapped binary model).
+    :param rng: random.Random to draw from (defaults to the global random module)
+    :param decoding: sampling.Decoding for temperature / top-k / top-p (optional)
+    """
+    rng = rng or random
+    if decoding is not None:
+        table = decoding_table(model, key, decoding)
+        if table is None or not table[0]:
+            return "~"
+        words, cumulative = table
+        return words[draw(cumulative, rng)]
+    sampler = getattr(model, "sample_next_word", None)
+    if sampler is not None:
+        return sampler(key, rng=rng)
+    entry = model.get(key)
+    if entry is None:
+        return "~"
+    if isinstance(entry, list):
+        return rng.choice(entry)
+    words, cum_weights = entry
+    return rng.choices(words, cum_weights=cum_weights)[0]
 
-def generate_text(model, start_words=None, n=2, max_words=20):
+def generate_text(model, start_words=None, n=2, max_words=20, rng=None, temperature=1.0, top_k=None, top_p=None):
     """
     Generate text from a word-level n-gram model.
     :param model: n-gram dict
     :param start_words: list of starting words (optional)
     :param n: n-gram size
     :param max_words: maximum number of words to generate
+    :param rng: random.Random to draw from, for reproducible output (optional)
+    :param temperature: <1 sharpens, >1 flattens, 0 is greedy
+    :param top_k: only sample from the k most probable next words (optional)
+    :param top_p: only sample from the smallest set of next words with this much mass (optional)
     """
+    decoding = make_decoding(temperature, top_k, top_p)
+    # Candidate tables compiled during this call, keyed on context
+    tables = {}
     if start_words is None:
         start_words = ["~"] * (n - 1)
     else:
         start_words = ["~"] * max(0, n - 1 - len(start_words)) + start_words[-(n-1):]
-
+    
     result = list(start_words)
     
     for _ in range(max_words):
         key = tuple(result[-(n - 1):])
-        possible = model.get(key, ["~"])
-        next_word = random.choice(possible)
+        if decoding is None:
+            next_word = sample_next_word(model, key, rng=rng)
+        else:
+            if key not in tables:
+                tables[key] = decoding_table(model, key, decoding)
+            table = tables[key]
+            next_word = table[0][draw(table[1], rng)] if table and table[0] else "~"
         if next_word == "~":
             break
         result.append(next_word)
     
-    return " ".join(result[(n - 1):])
\ No newline at end of file
+    return " ".join(result[(n - 1):])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a list-based model pickle to the weighted format")
+    parser.add_argument("src", help="existing model pickle")
+    parser.add_argument("dst", help="where to write the converted pickle")
+    args = parser.parse_args()
+    convert_model_file(args.src, args.dst)
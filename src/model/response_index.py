@@ -0,0 +1,212 @@
+import re
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """
+    Lookup form of an input: lowercase, punctuation dropped, whitespace collapsed.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub("", text.lower())).strip()
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    or max_distance + 1 as soon as the distance is known to exceed max_distance.
+    Bit-parallel (Hyyro, 2002): bit i of each vector holds a column of the DP
+    table for the i-th character of a, so a character of b costs a few integer
+    operations instead of a pass over the row.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if not a:
+        return len(b)
+    match = {}
+    bit = 1
+    for char in a:
+        match[char] = match.get(char, 0) | bit
+        bit <<= 1
+    mask = bit - 1
+    last = bit >> 1
+    positive, negative, distance = mask, 0, len(a)
+    diagonal = 0
+    previous_match = 0
+    remaining = len(b)
+    for char in b:
+        equal = match.get(char, 0)
+        transposed = ((~diagonal & equal) << 1) & previous_match
+        diagonal = ((((equal & positive) + positive) ^ positive) | equal | negative | transposed) & mask
+        horizontal_positive = (negative | ~(diagonal | positive)) & mask
+        horizontal_negative = positive & diagonal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        remaining -= 1
+        # Each remaining character of b lowers the distance by at most one
+        if distance - remaining > max_distance:
+            return max_distance + 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & mask
+        horizontal_negative = (horizontal_negative << 1) & mask
+        positive = (horizontal_negative | ~(diagonal | horizontal_positive)) & mask
+        negative = horizontal_positive & diagonal
+        previous_match = equal
+    return distance if distance <= max_distance else max_distance + 1
+
+def _deletes(text, max_distance):
+    """Every string reachable from text by deleting up to max_distance characters"""
+    variants = {text}
+    frontier = variants
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+@lru_cache(maxsize=1024)
+def _segments(length, parts):
+    """(start, size) of parts near-equal consecutive pieces of a string of this length"""
+    size, extra = divmod(length, parts)
+    segments = []
+    start = 0
+    for i in range(parts):
+        piece = size + (1 if i >= parts - extra else 0)
+        segments.append((start, piece))
+        start += piece
+    return tuple(segments)
+
+class ResponseIndex:
+    """
+    Precomputed lookup index over input -> response pairs.
+    Inputs are matched exactly, then on their normalized form, then to the
+    nearest stored input within max_distance edits. Each stored input is
+    split into 2 * max_distance + 1 segments; an edit (a transposition
+    included) touches at most two of them, so an input within max_distance
+    edits of the query has a segment that appears unchanged in the query,
+    shifted by at most max_distance characters. Segments are indexed by input
+    length, so a query looks up a few hundred exact substrings and verifies
+    only the inputs that share one, most shared segments first: every segment
+    missing from the query costs at least half an edit, so verification stops
+    once no remaining candidate can beat the best match. Inputs too short to
+    split usefully go to a SymSpell-style delete index instead. At most
+    max_candidates candidates are verified, with the bit-parallel edit distance.
+    """
+    def __init__(self, input_to_response, max_distance=2, short_length=10, min_length=4, max_candidates=64):
+        self.max_distance = max_distance
+        self.parts = 2 * max_distance + 1
+        self.short_length = max(short_length, self.parts)
+        self.min_length = min_length
+        self.max_candidates = max_candidates
+        self.keys = []
+        self.responses = []
+        self._exact = {}
+        self._normalized = {}
+        self._delete_index = {}
+        self._segment_index = {}
+
+        for key, response in input_to_response.items():
+            normalized = normalize_text(key)
+            self._exact.setdefault(key, response)
+            if normalized in self._normalized:
+                continue
+            index = len(self.keys)
+            self._normalized[normalized] = len(self.responses)
+            self.keys.append(normalized)
+            self.responses.append(response)
+            if len(normalized) <= self.short_length:
+                for variant in _deletes(normalized, max_distance):
+                    self._delete_index.setdefault(variant, []).append(index)
+            else:
+                length = len(normalized)
+                for part, (start, size) in enumerate(_segments(length, self.parts)):
+                    segment = (length, part, normalized[start:start + size])
+                    self._segment_index.setdefault(segment, []).append(index)
+
+    def _candidates(self, query):
+        """
+        (index, shared segments) of the stored inputs that may be within max_distance
+        of query, most shared first and then in storage order; delete-index matches
+        count as sharing every segment
+        """
+        k = self.max_distance
+        hits = []
+        close = set()
+        if len(query) <= self.short_length + k:
+            for variant in _deletes(query, k):
+                close.update(self._delete_index.get(variant, ()))
+        for length in range(max(len(query) - k, self.short_length + 1), len(query) + k + 1):
+            # A segment shifted by s needs |s| insertions/deletions before it and |delta - s| after it
+            delta = len(query) - length
+            shifts = [shift for shift in range(-k, k + 1) if abs(shift) + abs(delta - shift) <= k]
+            for part, (start, size) in enumerate(_segments(length, self.parts)):
+                segments = {query[start + shift:start + shift + size] for shift in shifts
+                            if 0 <= start + shift <= len(query) - size}
+                for segment in segments:
+                    hits.extend(self._segment_index.get((length, part, segment), ()))
+
+        for index in sorted(close):
+            yield index, self.parts
+        if not hits:
+            return
+        # Most candidates share a single segment and are usually never reached, so they are
+        # counted and grouped in numpy rather than one by one
+        indices, counts = np.unique(np.array(hits, dtype=np.int64), return_counts=True)
+        for count in range(self.parts, 0, -1):
+            for index in indices[counts == count].tolist():
+                yield index, count
+
+    def __len__(self):
+        return len(self._exact)
+
+    def nearest(self, text):
+        """
+        Closest stored input to text as (normalized key, distance), or None.
+        Ties go to the input stored first.
+        """
+        query = normalize_text(text)
+        if query in self._normalized:
+            return query, 0
+        if len(query) < self.min_length:
+            return None
+
+        best = None
+        best_distance = self.max_distance + 1
+        for index, count in islice(self._candidates(query), self.max_candidates):
+            # Fewest edits that leave only count of the segments intact
+            bound = (self.parts - count + 1) // 2
+            if bound > best_distance:
+                break
+            if bound == best_distance and best is not None and index > best:
+                continue
+            distance = edit_distance(query, self.keys[index], min(best_distance, self.max_distance))
+            if distance < best_distance or (distance == best_distance and best is not None and index < best):
+                best, best_distance = index, distance
+        if best is None or best_distance > self.max_distance:
+            return None
+        return self.keys[best], best_distance
+
+    def lookup(self, text):
+        """Response for text (exact, normalized or nearest match), or None"""
+        response = self._exact.get(text)
+        if response is not None:
+            return response
+        match = self.nearest(text)
+        if match is None:
+            return None
+        return self.responses[self._normalized[match[0]]]
+
+    def get(self, text, default=None):
+        response = self.lookup(text)
+        return default if response is None else response
+
+    def __contains__(self, text):
+        return self.lookup(text) is not None
+
+    def __getitem__(self, text):
+        response = self.lookup(text)
+        if response is None:
+            raise KeyError(text)
+        return response
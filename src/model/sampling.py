@@ -0,0 +1,71 @@
+import random
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+class Decoding(NamedTuple):
+    """
+    Decoding controls shared by the word, sentence and response generators.
+    temperature=0 is greedy; top_k keeps the k most probable candidates;
+    top_p keeps the smallest most-probable prefix whose mass reaches top_p.
+    """
+    temperature: float = 1.0
+    top_k: Optional[int] = None
+    top_p: Optional[float] = None
+
+def make_decoding(temperature=1.0, top_k=None, top_p=None):
+    """
+    Validated Decoding, or None when the settings mean plain sampling
+    (so callers keep their existing, reproducible sampling path).
+    """
+    if temperature < 0:
+        raise ValueError(f"temperature must be >= 0, got {temperature}")
+    if top_k is not None and top_k < 1:
+        raise ValueError(f"top_k must be >= 1, got {top_k}")
+    if top_p is not None and not 0 < top_p <= 1:
+        raise ValueError(f"top_p must be in (0, 1], got {top_p}")
+    if temperature == 1.0 and top_k is None and (top_p is None or top_p == 1):
+        return None
+    return Decoding(float(temperature), top_k, top_p)
+
+def candidate_table(weights, decoding):
+    """
+    Compile a context's weights into the candidates a decoding can draw.
+    top_k is selected with np.argpartition and only the survivors are sorted,
+    so the result (and every draw from it) is sized by k, not the vocabulary.
+    :param weights: non-negative weight (count or probability) per candidate
+    :return: (candidate indices, most probable first; cumulative probabilities)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    candidates = np.flatnonzero(weights > 0)
+    if decoding.top_k is not None and decoding.top_k < len(candidates):
+        part = np.argpartition(-weights[candidates], decoding.top_k - 1)[:decoding.top_k]
+        candidates = candidates[part]
+    # Most probable first; equal weights keep index order, so tables are deterministic
+    candidates = candidates[np.lexsort((candidates, -weights[candidates]))]
+    if len(candidates) == 0:
+        return candidates, np.zeros(0)
+
+    if decoding.temperature == 0:
+        candidates = candidates[:1]
+        probs = np.ones(1)
+    else:
+        logits = np.log(weights[candidates]) / decoding.temperature
+        probs = np.exp(logits - logits[0])
+        probs /= probs.sum()
+
+    cumulative = np.cumsum(probs)
+    if decoding.top_p is not None and decoding.top_p < 1:
+        keep = int(np.searchsorted(cumulative, decoding.top_p)) + 1
+        candidates = candidates[:keep]
+        cumulative = cumulative[:keep]
+    return candidates, cumulative
+
+def draw(cumulative, rng=None):
+    """
+    Position drawn from a cumulative table (need not end at 1).
+    :param rng: random.Random, numpy Generator or the random module (default)
+    """
+    target = (rng or random).random() * cumulative[-1]
+    position = int(np.searchsorted(cumulative, target, side="right"))
+    return min(position, len(cumulative) - 1)
@@ -0,0 +1,160 @@
+import os
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from corpus_stream import CorpusSource, DEFAULT_CHUNK_SIZE, iter_words
+from lru_cache import LRUCache
+
+# Tokens joined per piece by chunks(); bounds the size of each string built for streaming consumers
+WORDS_PER_CHUNK = 65536
+
+
+class TokenizedCorpus:
+    """
+    A corpus tokenized once into interned word IDs
+    tokens is a read-only int32 array of IDs in corpus order, vocab maps an
+    ID back to its word (in first-seen order) and counts is the frequency of
+    every ID. Slices of tokens are views, words are yielded as the interned
+    vocabulary strings, and frequency-weighted consumers (e.g.
+    CharacterNGram.train_counts) work per word type instead of per token
+    """
+
+    def __init__(self, tokens: np.ndarray, vocab: List[str], word_to_id: Optional[Dict[str, int]] = None):
+        self.tokens = tokens
+        self.tokens.flags.writeable = False
+        self.vocab = vocab
+        self.word_to_id = word_to_id if word_to_id is not None else {word: i for i, word in enumerate(vocab)}
+        self.counts = np.bincount(tokens, minlength=len(vocab))
+        self.counts.flags.writeable = False
+        self._text: Optional[str] = None
+        self._type_lengths: Optional[np.ndarray] = None
+        self._char_counts: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_words(cls, words: Iterable[str], lowercase: bool = False) -> 'TokenizedCorpus':
+        """Intern a stream of words; memory grows with the vocabulary plus 4 bytes per token"""
+        word_to_id: Dict[str, int] = {}
+        ids = array('i')
+        append = ids.append
+        intern = word_to_id.setdefault
+        if lowercase:
+            words = (word.lower() for word in words)
+        for word in words:
+            append(intern(word, len(word_to_id)))
+        # Wraps the array's buffer, so the IDs are never copied
+        tokens = np.frombuffer(ids, dtype=np.int32) if ids else np.zeros(0, dtype=np.int32)
+        return cls(tokens, list(word_to_id), word_to_id)
+
+    @classmethod
+    def from_source(cls, source: CorpusSource, lowercase: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    encoding: str = 'utf-8') -> 'TokenizedCorpus':
+        """Tokenize a file path (streamed in chunks, any size) or an iterable of text on whitespace"""
+        return cls.from_words(iter_words(source, chunk_size, encoding), lowercase)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def num_types(self) -> int:
+        return len(self.vocab)
+
+    def word_ids(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Read-only view of the token IDs in [start, stop)"""
+        return self.tokens[start:stop]
+
+    def words(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Tokens in [start, stop) as words, decoded one block at a time"""
+        vocab = self.vocab
+        ids = self.tokens[start:stop]
+        for offset in range(0, len(ids), WORDS_PER_CHUNK):
+            yield from map(vocab.__getitem__, ids[offset:offset + WORDS_PER_CHUNK].tolist())
+
+    def chunks(self, words_per_chunk: int = WORDS_PER_CHUNK) -> Iterator[str]:
+        """Space-joined runs of words, for streaming consumers (train_stream, model_store.fingerprint)"""
+        vocab = self.vocab
+        for offset in range(0, len(self.tokens), words_per_chunk):
+            yield ' '.join(map(vocab.__getitem__, self.tokens[offset:offset + words_per_chunk].tolist()))
+
+    def word_counts(self) -> Iterator[Tuple[str, int]]:
+        """(word, frequency) for every vocabulary word, in ID order"""
+        return zip(self.vocab, self.counts.tolist())
+
+    def most_common(self, k: int) -> List[Tuple[str, int]]:
+        """k most frequent words, highest first; ties keep first-seen order"""
+        k = min(k, len(self.vocab))
+        if k <= 0:
+            return []
+        top = np.argpartition(-self.counts, k - 1)[:k]
+        top = top[np.lexsort((top, -self.counts[top]))]
+        return [(self.vocab[i], int(self.counts[i])) for i in top]
+
+    @property
+    def type_lengths(self) -> np.ndarray:
+        """Length in characters of every vocabulary word; type_lengths[tokens] gives per-token lengths"""
+        if self._type_lengths is None:
+            self._type_lengths = np.fromiter(map(len, self.vocab), dtype=np.int64, count=len(self.vocab))
+            self._type_lengths.flags.writeable = False
+        return self._type_lengths
+
+    @property
+    def total_chars(self) -> int:
+        """Characters in all tokens, not counting separators"""
+        return int(self.type_lengths @ self.counts)
+
+    def char_counts(self) -> Dict[str, int]:
+        """Character frequency table, computed per word type and weighted by frequency"""
+        if self._char_counts is None:
+            counts = Counter()
+            for word, count in self.word_counts():
+                for char, n in Counter(word).items():
+                    counts[char] += n * count
+            self._char_counts = dict(counts)
+        return self._char_counts
+
+    @property
+    def text(self) -> str:
+        """
+        The tokens joined by single spaces, built on first use and kept
+        A str is already an immutable sequence of characters, so character-level
+        consumers index and iterate this one copy instead of their own lists
+        """
+        if self._text is None:
+            self._text = ' '.join(self.chunks())
+        return self._text
+
+    def save(self, directory: Union[str, os.PathLike]):
+        """Write tokens.npy and vocab.txt, so load() can memory-map a large corpus instead of re-tokenizing"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / 'tokens.npy', self.tokens)
+        # Words never contain whitespace, so one word per line is unambiguous
+        with open(directory / 'vocab.txt', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.vocab))
+
+    @classmethod
+    def load(cls, directory: Union[str, os.PathLike], mmap: bool = True) -> 'TokenizedCorpus':
+        """Read a corpus written by save(); with mmap the token array stays on disk"""
+        directory = Path(directory)
+        tokens = np.load(directory / 'tokens.npy', mmap_mode='r' if mmap else None)
+        with open(directory / 'vocab.txt', 'r', encoding='utf-8') as f:
+            text = f.read()
+        return cls(tokens, text.split('\n') if text else [])
+
+
+# Tokenized files keyed on (path, modification time, size, options), so an edited file is re-read
+_file_cache = LRUCache(8)
+
+
+def load_corpus(path: Union[str, os.PathLike], lowercase: bool = False, encoding: str = 'utf-8') -> TokenizedCorpus:
+    """Tokenize a corpus file once per process; later calls return the cached corpus"""
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size, lowercase, encoding)
+    corpus = _file_cache.get(key)
+    if corpus is None:
+        corpus = TokenizedCorpus.from_source(path, lowercase=lowercase, encoding=encoding)
+        _file_cache.put(key, corpus)
+    return corpus
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from tokenized_corpus import TokenizedCorpus
+
 # Word-level training data - focused on complete words and sentences
 WORD_CONVERSATIONS = [
     "Mholo|Mholo unjani",
@@ -132,13 +135,26 @@ WORD_VOCABULARY = [
     "ingi", "ongo", "ungu", "inza", "enze", "inzi", "onzo", "unzu"
 ]
 
+def iter_word_corpus():
+    """Stream corpus words for word-level N-gram training without building the joined string"""
+    for conv in WORD_CONVERSATIONS:
+        for part in conv.split("|"):
+            yield from part.split()
+    yield from WORD_VOCABULARY
+
+def iter_conversation_lines():
+    """Stream conversation pairs as lines for sentence-level training"""
+    yield from WORD_CONVERSATIONS
+
+@lru_cache(maxsize=None)
+def get_word_tokens():
+    """Word corpus tokenized once per process (interned IDs, vocabulary and frequencies)"""
+    return TokenizedCorpus.from_words(iter_word_corpus())
+
 def get_word_corpus():
-    """Get corpus for word-level N-gram training"""
-    # Combining conversations and vocabulary
-    conversation_text = " ".join(" ".join(conv.split("|")) for conv in WORD_CONVERSATIONS)
-    vocab_text = " ".join(WORD_VOCABULARY)
-    return conversation_text + " " + vocab_text
+    """Get corpus for word-level N-gram training (joined once and cached)"""
+    return get_word_tokens().text
 
 def get_word_list():
     """Get words as list for training"""
-    return get_word_corpus().split()
\ No newline at end of file
+    return list(get_word_tokens().words())
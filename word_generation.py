@@ -0,0 +1,137 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from char_corpus import COMMON_XHOSA_WORDS
+
+DEFAULT_CHUNK_SIZE = 1000
+# Uniforms drawn per Generator call
+UNIFORM_BLOCK_SIZE = 4096
+
+# Model of a worker process, set once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+class BlockUniforms:
+    """
+    random()-compatible view of a numpy Generator for generate_word
+    Generator.random() costs far more per call than random.random(), and word
+    generation draws one uniform per character, so uniforms are drawn in
+    blocks and random is the C-level __next__ of an endless stream over them
+    """
+
+    def __init__(self, generator: np.random.Generator, block_size: int = UNIFORM_BLOCK_SIZE):
+        self.generator = generator
+        blocks = iter(lambda: generator.random(block_size).tolist(), None)
+        self.random = chain.from_iterable(blocks).__next__
+
+    def choice(self, seq: Sequence):
+        return seq[min(int(self.random() * len(seq)), len(seq) - 1)]
+
+
+def _generate_chunk_with(model, seed: np.random.SeedSequence, size: int, params: Dict) -> List[str]:
+    """size words drawn from one independent Generator stream"""
+    rng = BlockUniforms(np.random.default_rng(seed))
+    return [model.generate_word(rng=rng, **params) for _ in range(size)]
+
+
+def _generate_chunk(args) -> List[str]:
+    """Worker: generate one chunk with the process-local model"""
+    seed, size, params = args
+    return _generate_chunk_with(_worker_model, seed, size, params)
+
+
+def _iter_chunks(model, seed: Optional[int], chunk_size: int, workers: int, params: Dict) -> Iterator[List[str]]:
+    """
+    Endless stream of generated chunks, in chunk order
+    Chunk k always draws from the k-th child of SeedSequence(seed), so the
+    stream depends on the seed and chunk size but not on the worker count.
+    At most 2 * workers chunks are in flight; unfinished ones are cancelled
+    when the consumer stops
+    """
+    root = np.random.SeedSequence(seed)
+    if workers == 1:
+        while True:
+            yield _generate_chunk_with(model, root.spawn(1)[0], chunk_size, params)
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,))
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                pending.append(executor.submit(_generate_chunk, (root.spawn(1)[0], chunk_size, params)))
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+
+def iter_generated_words(model, count: Optional[int] = None, seed: Optional[int] = None,
+                         workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         unique: bool = False, exclude_common: bool = False,
+                         exclude: Optional[Iterable[str]] = None, max_candidates: Optional[int] = None,
+                         **generate_kwargs) -> Iterator[str]:
+    """
+    Stream words from a CharacterNGram, generated in parallel with reproducible seeding
+    The same seed and chunk_size give the same words in the same order for any
+    number of workers (seed=None draws fresh OS entropy)
+    :param count: stop after this many words (None streams until the caller stops)
+    :param workers: generating processes (default: one per core; 1 generates inline)
+    :param unique: skip words already yielded
+    :param exclude_common: skip the words of char_corpus.COMMON_XHOSA_WORDS (the training lexicon)
+    :param exclude: further words to skip
+    :param max_candidates: give up after generating this many candidates, so a filter the
+        model cannot satisfy cannot loop forever (default: 20 * count when filtering)
+    :param generate_kwargs: passed to generate_word (max_length, start_pattern, temperature, ...)
+    """
+    if count is not None and count <= 0:
+        return
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    workers = workers or os.cpu_count() or 1
+
+    excluded = set(word.lower() for word in exclude) if exclude is not None else set()
+    if exclude_common:
+        excluded.update(word.lower() for word in COMMON_XHOSA_WORDS)
+    filtering = unique or bool(excluded)
+    if max_candidates is None and filtering and count is not None:
+        max_candidates = 20 * count
+    # With no filter every candidate is kept, so a small request needs no more than count per chunk
+    if count is not None and not filtering:
+        chunk_size = min(chunk_size, count)
+
+    seen = set()
+    produced = 0
+    candidates = 0
+    chunks = _iter_chunks(model, seed, chunk_size, workers, generate_kwargs)
+    try:
+        for chunk in chunks:
+            for word in chunk:
+                candidates += 1
+                if word in excluded or (unique and word in seen):
+                    continue
+                if unique:
+                    seen.add(word)
+                yield word
+                produced += 1
+                if count is not None and produced >= count:
+                    return
+            if max_candidates is not None and candidates >= max_candidates:
+                return
+    finally:
+        chunks.close()
+
+
+def generate_words(model, count: int, **kwargs) -> List[str]:
+    """List of up to count words; see iter_generated_words for the options"""
+    return list(iter_generated_words(model, count, **kwargs))
@@ -0,0 +1,122 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from lru_cache import LRUCache
+
+# Common Xhosa noun-class / infinitive prefixes and locative / diminutive suffixes, in priority order
+XHOSA_PREFIXES = ['umu', 'aba', 'imi', 'ama', 'isi', 'izi', 'ubu', 'uku', 'ili']
+XHOSA_SUFFIXES = ['eni', 'ini', 'oni', 'weni', 'yeni', 'kazi', 'ana']
+
+# Keep letters, numbers, whitespace, and extended Latin
+_STRIP_PATTERN = re.compile(r'[^\w\s\u00C0-\u00FF\u0100-\u017F]')
+
+
+class AffixTrie:
+    """
+    Affix list compiled into a character transition table
+    Prefixes are matched walking forward from the start of a word, suffixes
+    walking backward from its end, so every affix is tested in one pass
+    instead of one startswith/endswith call each
+    """
+
+    def __init__(self, affixes: Sequence[str], from_end: bool = False):
+        self.from_end = from_end
+        # node -> {char: next node}; node 0 is the root
+        self._transitions: List[Dict[str, int]] = [{}]
+        # node -> priority (position in the affix list) of the affix ending there
+        self._accepting: Dict[int, int] = {}
+        for priority, affix in enumerate(affixes):
+            node = 0
+            for char in (reversed(affix) if from_end else affix):
+                next_node = self._transitions[node].get(char)
+                if next_node is None:
+                    next_node = len(self._transitions)
+                    self._transitions.append({})
+                    self._transitions[node][char] = next_node
+                node = next_node
+            self._accepting.setdefault(node, priority)
+
+    def matches(self, word: str) -> Iterator[Tuple[int, int]]:
+        """(priority, length) of every affix at the start (or end) of word, shortest first"""
+        node = 0
+        chars = reversed(word) if self.from_end else word
+        for length, char in enumerate(chars, 1):
+            node = self._transitions[node].get(char)
+            if node is None:
+                return
+            priority = self._accepting.get(node)
+            if priority is not None:
+                yield priority, length
+
+
+class XhosaSegmenter:
+    """
+    Table-driven version of SentenceNGram's sentence preprocessing
+    Same rules as the original scans: the first prefix in list order that
+    leaves more than 2 characters is split off, then the first suffix in list
+    order that leaves more than 2 characters. Segmentations of long tokens are
+    memoized, since the same agglutinated words recur throughout a corpus
+    """
+
+    def __init__(self, prefixes: Sequence[str] = XHOSA_PREFIXES, suffixes: Sequence[str] = XHOSA_SUFFIXES,
+                 min_length: int = 9, cache_size: Optional[int] = 100000):
+        self.prefixes = AffixTrie(prefixes)
+        self.suffixes = AffixTrie(suffixes, from_end=True)
+        # Only tokens at least this long are treated as agglutinated and segmented
+        self.min_length = min_length
+        self._cache = LRUCache(cache_size)
+
+    def _best(self, trie: AffixTrie, word: str) -> int:
+        """Length of the highest-priority affix that leaves more than 2 characters, or 0"""
+        best_priority, best_length = None, 0
+        for priority, length in trie.matches(word):
+            if len(word) > length + 2 and (best_priority is None or priority < best_priority):
+                best_priority, best_length = priority, length
+        return best_length
+
+    def _segment(self, word: str) -> Tuple[str, ...]:
+        segments = []
+        prefix_length = self._best(self.prefixes, word)
+        if prefix_length:
+            segments.append(word[:prefix_length])
+            word = word[prefix_length:]
+
+        suffix_length = self._best(self.suffixes, word)
+        if suffix_length:
+            segments.append(word[:-suffix_length])
+            segments.append(word[-suffix_length:])
+        else:
+            segments.append(word)
+        return tuple(segments)
+
+    def segment(self, word: str) -> List[str]:
+        """Split one word into prefix / stem / suffix segments (memoized)"""
+        segments = self._cache.get(word)
+        if segments is None:
+            segments = self._segment(word)
+            self._cache.put(word, segments)
+        return list(segments)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase, strip punctuation, split, and segment long tokens"""
+        tokens = []
+        for token in _STRIP_PATTERN.sub('', text.lower()).split():
+            if len(token) < self.min_length:
+                tokens.append(token)
+                continue
+            segments = self._cache.get(token)
+            if segments is None:
+                segments = self._segment(token)
+                self._cache.put(token, segments)
+            tokens.extend(segments)
+        return tokens
+
+    def tokenize_batch(self, texts: Iterable[str]) -> List[List[str]]:
+        """Tokenize many sentences, sharing the segmentation cache across them"""
+        return [self.tokenize(text) for text in texts]
+
+    def cache_info(self) -> Dict:
+        return self._cache.stats()
+
+
+# Shared by every model in a process, so one warm cache serves training and scoring
+default_segmenter = XhosaSegmenter()